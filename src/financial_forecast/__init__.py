@@ -1 +1,3 @@
 from .simulation import FinancialForecast
+from .accumulators import OnlineMoments, StreamingHistogram
+from .batch import batch_fair_value_summary
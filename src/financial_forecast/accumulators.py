@@ -0,0 +1,140 @@
+import numpy as np
+
+
+class OnlineMoments:
+    def __init__(self) -> None:
+        """Keeping track of the count, mean and variance of values that arrive in chunks,
+        without storing the values themselves. Values that are not finite are ignored and counted in dropped.
+        """
+        self.count = 0
+        self.dropped = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # Sum of squared deviations from the mean.
+
+    def update(self, values: np.ndarray) -> None:
+        """Adding a chunk of values to the moments. Values that are not finite are ignored.
+
+        Args:
+            values (np.ndarray): The values to add.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        finite = np.isfinite(values)
+        self.dropped += int(values.size - finite.sum())
+        values = values[finite]
+        if values.size == 0:
+            return
+        mean = values.mean()
+        self._combine(values.size, mean, np.sum((values - mean) ** 2))
+
+    def merge(self, other: "OnlineMoments") -> None:
+        """Adding the moments of another accumulator to this one.
+
+        Args:
+            other (OnlineMoments): The accumulator to merge into this one.
+        """
+        self.dropped += other.dropped
+        if other.count > 0:
+            self._combine(other.count, other.mean, other._m2)
+
+    def _combine(self, count: int, mean: float, m2: float) -> None:
+        # Combining the moments of two sets of values (Chan et al.).
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count > 0 else np.nan
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.variance)
+
+
+class StreamingHistogram:
+    def __init__(self, n_bins: int = 1000) -> None:
+        """A histogram with a fixed number of equally wide bins, where the range grows when values fall outside of it.
+        When the range grows the bin width is doubled by merging neighbouring bins, so the memory stays the same
+        no matter how many values are added. The histogram is also used as a sketch to estimate quantiles.
+        Values that are not finite are ignored and counted in dropped.
+
+        Args:
+            n_bins (int, optional): The number of bins, which must be even. Defaults to 1000.
+        """
+        if n_bins % 2 != 0:
+            raise ValueError("The number of bins must be even.")
+        self.n_bins = n_bins
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.dropped = 0
+        self.start = None
+        self.width = None
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def edges(self) -> np.ndarray:
+        return self.start + self.width * np.arange(self.n_bins + 1)
+
+    def update(self, values: np.ndarray) -> None:
+        """Adding a chunk of values to the histogram. Values that are not finite are ignored.
+
+        Args:
+            values (np.ndarray): The values to add.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        finite = np.isfinite(values)
+        self.dropped += int(values.size - finite.sum())
+        values = values[finite]
+        if values.size == 0:
+            return
+
+        low, high = values.min(), values.max()
+        if self.start is None:
+            # The first chunk sets the initial range.
+            self.start = low
+            self.width = (high - low) / self.n_bins or max(abs(low), 1.0) * 1e-6
+
+        while low < self.start:
+            self._grow(to_the_left=True)
+        while high >= self.start + self.n_bins * self.width:
+            self._grow(to_the_left=False)
+
+        idx = ((values - self.start) / self.width).astype(np.int64)
+        np.clip(idx, 0, self.n_bins - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.n_bins)
+
+    def density(self) -> np.ndarray:
+        """Creating the probability density of each bin, so it can be plotted like a normalised histogram.
+
+        Returns:
+            np.ndarray: The density of each bin.
+        """
+        return self.counts / (self.count * self.width)
+
+    def quantile(self, q: float | np.ndarray) -> float | np.ndarray:
+        """Estimating the quantiles by interpolating linearly within the bins.
+
+        Args:
+            q (float | np.ndarray): The quantile(s) between 0 and 1.
+
+        Returns:
+            float | np.ndarray: The estimated quantile(s).
+        """
+        cdf = np.concatenate([[0.0], np.cumsum(self.counts) / self.count])
+        return np.interp(q, cdf, self.edges)
+
+    def _grow(self, to_the_left: bool) -> None:
+        # Doubling the bin width by merging pairs of bins, so the range covers twice as much.
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        self.counts = np.zeros_like(self.counts)
+        half = self.n_bins // 2
+        if to_the_left:
+            self.counts[half:] = merged
+            self.start -= self.n_bins * self.width
+        else:
+            self.counts[:half] = merged
+        self.width *= 2
@@ -0,0 +1,161 @@
+import numpy as np
+from .simulation import cagr, net_income, free_cashflow, discounted_company_value
+
+# The drivers needed to calculate the fair value per share.
+BATCH_DRIVERS = (
+    "revenue",
+    "ebit_margin",
+    "interest_expense",
+    "deprication_amortization",
+    "net_working_capital",
+)
+
+
+def batch_fair_value_summary(
+    current,
+    estimates,
+    n_periods: int,
+    wacc,
+    perpetual_rate,
+    tax_rate,
+    n_samples: int = 10000,
+    chunk_size: int = 50,
+    quantiles: tuple = (0.05, 0.5, 0.95),
+    seed=None,
+    dtype=np.float64,
+) -> dict:
+    """Simulating the fair value per share of many companies at once, with the same model as FinancialForecast.
+    All companies in a chunk are simulated as one stacked companies*samples*periods computation,
+    and only the summary of each company is kept, so the memory is bounded by the chunk size.
+    Like FinancialForecast, samples that are nan (e.g. the CAGR of a negative estimate) make the summary
+    of the company nan, and the number of them is included in the summary.
+
+    The tables are columnar, e.g. a pd.DataFrame or a dictionary of arrays, with one row per company.
+    Scalars are used for all companies.
+
+    Args:
+        current: A table with the current value of each driver (revenue, ebit_margin, interest_expense,
+            deprication_amortization and net_working_capital).
+        estimates: A table, or a list of tables with one per scenario, with the estimated value of each driver,
+            the <driver>_uncertainty, the probability of the scenario and the number of shares.
+        n_periods (int): The number of periods to forecast.
+        wacc (float | np.ndarray): The weighted average cost of capital.
+        perpetual_rate (float | np.ndarray): The growth rate after the last period.
+        tax_rate (float | np.ndarray): The tax rate.
+        n_samples (int, optional): The number of samples per company, which is split across the scenarios by their probability. Defaults to 10000.
+        chunk_size (int, optional): The number of companies simulated at once. Defaults to 50.
+        quantiles (tuple, optional): The quantiles of the fair value per share to include. Defaults to (0.05, 0.5, 0.95).
+        seed (int | np.random.Generator, optional): The seed of the random number generator. Defaults to None.
+        dtype (np.dtype, optional): The float type of the simulations. Defaults to np.float64.
+
+    Returns:
+        dict: The mean and std of the fair value per share and the number of nan samples with one value per company,
+            and the quantiles with shape len(quantiles)*companies.
+    """
+    if not isinstance(estimates, (list, tuple)):
+        estimates = [estimates]
+    rng = np.random.default_rng(seed)
+    n_companies = len(np.atleast_1d(np.asarray(current[BATCH_DRIVERS[0]])))
+
+    def column(table, name) -> np.ndarray:
+        return np.broadcast_to(np.asarray(table[name], dtype=dtype), (n_companies,))
+
+    # Scenario parameters with shape scenarios*companies.
+    probability = np.stack([column(estimate, "probability") for estimate in estimates])
+    samples = (probability * n_samples).astype(int)
+    shares = np.stack([column(estimate, "shares") for estimate in estimates])
+    drivers = {
+        driver: (
+            column(current, driver),
+            np.stack([column(estimate, driver) for estimate in estimates]),
+            np.stack(
+                [column(estimate, driver + "_uncertainty") for estimate in estimates]
+            ),
+        )
+        for driver in BATCH_DRIVERS
+    }
+    wacc = column({"wacc": wacc}, "wacc")
+    perpetual_rate = column({"perpetual_rate": perpetual_rate}, "perpetual_rate")
+    tax_rate = column({"tax_rate": tax_rate}, "tax_rate")
+    periods = np.arange(1, n_periods + 1, dtype=dtype)
+
+    summary = {
+        "mean": np.empty(n_companies),
+        "std": np.empty(n_companies),
+        "quantiles": np.empty((len(quantiles), n_companies)),
+        "n_nan": np.zeros(n_companies, dtype=np.int64),
+    }
+    for start in range(0, n_companies, chunk_size):
+        companies = slice(start, min(start + chunk_size, n_companies))
+        chunk_samples = samples[:, companies]
+        company_rows = chunk_samples.sum(axis=0)
+        n_rows = company_rows.max(initial=0)
+
+        # The scenario of each row of each company. The rows after the last scenario of a company
+        # get the index len(estimates) and are filled with nan. They are padding, which is left out
+        # of the summary by the valid mask, so nan samples within the company rows are still counted.
+        scenario_end = np.cumsum(chunk_samples, axis=0)
+        rows = np.arange(n_rows)
+        scenario = (rows[None, :, None] >= scenario_end.T[:, None, :]).sum(axis=2)
+        company = np.arange(chunk_samples.shape[1])[:, None]
+
+        def per_row(values) -> np.ndarray:
+            # Spreading a scenario*companies parameter out to the companies*rows of the chunk.
+            values = values[:, companies]
+            padded = np.vstack([values, np.full((1, values.shape[1]), np.nan)])
+            return padded[scenario, company]
+
+        matrices = {}
+        for driver, (current_value, estimate, uncertainty) in drivers.items():
+            current_value = current_value[companies].reshape(-1, 1)
+            arr_estimate = rng.standard_normal(scenario.shape, dtype=dtype)
+            arr_estimate *= per_row(uncertainty)
+            arr_estimate += per_row(estimate)
+            arr_cagr = cagr(current_value, arr_estimate, n_periods)
+            matrices[driver] = current_value[..., None] * np.power(
+                1 + arr_cagr[..., None], periods
+            )
+
+        chunk_income = net_income(
+            matrices["revenue"],
+            matrices["ebit_margin"],
+            matrices["interest_expense"],
+            tax_rate[companies].reshape(-1, 1, 1),
+        )
+        fcf = free_cashflow(
+            chunk_income,
+            matrices["net_working_capital"],
+            matrices["interest_expense"],
+            matrices["deprication_amortization"],
+        )
+        chunk_wacc = wacc[companies].reshape(-1, 1)
+        company_value = discounted_company_value(
+            fcf,
+            np.power(1 + chunk_wacc[..., None], periods),
+            chunk_wacc,
+            perpetual_rate[companies].reshape(-1, 1),
+        )
+        fair_value_per_share = company_value / per_row(shares)
+
+        valid = rows < company_rows.reshape(-1, 1)
+        # Companies without any samples get a nan summary.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(valid, fair_value_per_share, 0).sum(axis=1) / company_rows
+            deviation = np.where(valid, fair_value_per_share - mean.reshape(-1, 1), 0)
+            std = np.sqrt((deviation**2).sum(axis=1) / company_rows)
+        summary["mean"][companies] = mean
+        summary["std"][companies] = std
+        summary["n_nan"][companies] = (valid & np.isnan(fair_value_per_share)).sum(
+            axis=1
+        )
+        for i, n in enumerate(company_rows):
+            summary["quantiles"][:, start + i] = (
+                np.quantile(fair_value_per_share[i, :n], quantiles) if n > 0 else np.nan
+            )
+
+    if summary["n_nan"].any():
+        print(
+            f"{np.count_nonzero(summary['n_nan'])} of the companies have samples of the fair value per share that are nan."
+        )
+
+    return summary
@@ -1,9 +1,46 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+from .accumulators import OnlineMoments, StreamingHistogram
 
 
 class FinancialForecast:
     # Source of inspiration: https://www.linkedin.com/pulse/how-assess-value-company-combining-discounted-cash-anthony/
 
+    # The drivers are sampled from the current and estimate dictionaries.
+    DRIVERS = (
+        "revenue",
+        "gross_margin",
+        "deprication_amortization",
+        "interest_expense",
+        "net_working_capital",
+        "ebit_margin",
+    )
+
+    # The line items as a graph, where each line item lists the line items and the parameters
+    # it is calculated from. A line item is only recalculated when one of those change.
+    # The drivers depend on the current and estimate dictionaries through _inputs_version.
+    LINE_ITEMS = {
+        **{driver: ((), ("n_periods", "_inputs_version")) for driver in DRIVERS},
+        "gross_profit": (("revenue", "gross_margin"), ()),
+        "selling_general_admin_expense": (
+            ("gross_profit", "deprication_amortization", "ebit_margin"),
+            (),
+        ),
+        "net_income": (("revenue", "ebit_margin", "interest_expense"), ("tax_rate",)),
+        "free_cashflow": (
+            (
+                "net_income",
+                "net_working_capital",
+                "interest_expense",
+                "deprication_amortization",
+            ),
+            (),
+        ),
+        "company_value": (("free_cashflow",), ("wacc", "perpetual_rate")),
+        "fair_value_per_share": (("company_value",), ()),
+    }
+
     def __init__(
         self,
         current: dict = None,
@@ -31,7 +68,9 @@ class FinancialForecast:
         perpetual_rate=None,
         n_samples=10000,
         tax_rate=None,
-        **kwargs
+        seed=None,
+        dtype=np.float64,
+        **kwargs,
     ) -> None:
         """This function will forecast the financials of a company with a given set of input and then do a set of simulations with some different scenarios to get
         the most accurate picture of where a company x periods into the future.
@@ -47,13 +86,20 @@ class FinancialForecast:
             - current_gross_margin (float): What is the gross profit margin for the current FY.
             - estimated_gross_margin (float): What is the gross profit margin n periods into the future.
             - uncertainty_pct (float, optional): This is used to calculate a standard deviation of the gross profit. Defaults to 0.2.
+        - seed (int | np.random.Generator, optional): The seed of the random number generator, or a generator to draw the samples from.
+          The same seed gives the same samples. Defaults to None.
+        - dtype (np.dtype, optional): The float type of the samples, np.float32 halves the memory of large simulations. Defaults to np.float64.
+
+        The calculated line items are cached. Assigning new current or estimates dictionaries (ff.current = {...})
+        makes the drivers be sampled again, but changing the dictionaries in place (ff.current["revenue"] = ...)
+        isn't noticed, so resample() must be called afterwards.
         """
 
+        self._inputs_version = 0
+        self._requested_samples = n_samples
+        self._cache_keys = {}
+        self._versions = {}
         self.current = current
-        if isinstance(estimates, dict):
-            self.estimates = [estimates]
-        elif isinstance(estimates, list):
-            self.estimates = estimates
         # self.current_revenue=current_revenue
         # self.estimated_future_revenue=estimated_future_revenue
         # self.estimated_future_revenue_uncertainty=estimated_future_revenue_uncertainty
@@ -75,381 +121,523 @@ class FinancialForecast:
         self.n_periods = n_periods
         self.wacc = wacc
         self.perpetual_rate = perpetual_rate
-        self.n_samples = n_samples
         self.tax_rate = tax_rate
-
-        scenario_names = []
-        total_samples = 0
-        for i, estimate in enumerate(self.estimates):
-            samples = int(estimate["probability"] * n_samples)
-            total_samples += samples
-            try:
-                scenario_name = estimate["scenario_name"]
-            except:
-                scenario_name = "scenario_" + str(i)
-            for _ in range(samples):
-                scenario_names.append(scenario_name)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.dtype = np.dtype(dtype)
+        self.estimates = estimates
+
+    @property
+    def current(self) -> dict:
+        return self._current
+
+    @current.setter
+    def current(self, current: dict) -> None:
+        self._current = current
+        self._inputs_version += 1
+
+    @property
+    def estimates(self) -> list:
+        return self._estimates
+
+    @estimates.setter
+    def estimates(self, estimates: dict | list) -> None:
+        # The scenarios decide how the samples are split, so the output is laid out again.
+        if isinstance(estimates, dict):
+            estimates = [estimates]
+        self._estimates = estimates
+        self._inputs_version += 1
+
+        scenario_names = [
+            estimate["scenario_name"]
+            if "scenario_name" in estimate.keys()
+            else "scenario_" + str(i)
+            for i, estimate in enumerate(self.estimates)
+        ]
+        samples = [
+            int(self._requested_samples * estimate["probability"])
+            for estimate in self.estimates
+        ]
         self.output = {
-            "samples": [
-                int(self.n_samples * estimate["probability"])
-                for estimate in self.estimates
-            ],
-            "scenario_name": [
-                estimate["scenario_name"]
-                if "scenario_name" in estimate.keys()
-                else "scenario_" + str(i)
-                for i, estimate in enumerate(self.estimates)
-            ],
-            "scenario_name_long": scenario_names,
+            "samples": samples,
+            "scenario_name": scenario_names,
+            # Row offsets of each scenario block, so scenario i spans offsets[i]:offsets[i + 1].
+            "offsets": np.cumsum([0] + samples),
         }
-        self.n_samples = total_samples
+        self._scenario_lookup = {name: i for i, name in enumerate(scenario_names)}
+        self.n_samples = int(self.output["offsets"][-1])
+
+    def get_scenario_index(self) -> np.ndarray:
+        """Creating an array with the index of the scenario of each sample.
+        The index refers to the position in output["scenario_name"], which works as the categorical lookup.
+
+        Returns:
+            np.ndarray: An array with length n_samples with the scenario index of each sample.
+        """
+        if not "scenario_index" in self.output.keys():
+            dtype = np.min_scalar_type(max(len(self.estimates) - 1, 0))
+            self.output["scenario_index"] = np.repeat(
+                np.arange(len(self.estimates), dtype=dtype), self.output["samples"]
+            )
+        return self.output["scenario_index"]
+
+    def get_scenario_slice(self, scenario_name: str) -> slice:
+        """Finding the rows of a scenario in the output matrices.
+
+        Args:
+            scenario_name (str): The name of the scenario.
+
+        Returns:
+            slice: The slice of rows belonging to the scenario, e.g. ff.output["revenue"][ff.get_scenario_slice("likely")].
+        """
+        i = self._scenario_lookup[scenario_name]
+        offsets = self.output["offsets"]
+        return slice(int(offsets[i]), int(offsets[i + 1]))
 
     def get_revenue(self) -> np.ndarray:
         """Create a matrix with a shape of n_samples*n_periods with the estimated revenue in each period for each simulation.
         Each simulation has a CAGR and that CAGR is used for the growth rate of revenue.
 
-        Raises:
-            Exception: If the estimated_future_revenue haven't been set through the set_revenue() function, then it will raise an error.
-
         Returns:
             np.ndarray: An array with shape n_samples*n_periods with the estimated revenue in each period for each simulation.
         """
+        return self._evaluate("revenue")
 
-        if not "revenue" in self.current.keys():
-            print(
-                "The current dictionary must have a field called revenue, which should contain the latest known revenue."
-            )
+    def get_gross_margin(self) -> np.ndarray:
+        return self._evaluate("gross_margin")
 
-        for estimate, samples in zip(self.estimates, self.output["samples"]):
-            # For each of the scenarios the estimated revenue matrix must be set and added to the output matrix.
-            if (
-                not "revenue" in estimate.keys()
-                or not "revenue_uncertainty" in estimate.keys()
-            ):
-                print(
-                    "The estimate dictionary must have fields called revenue and revenue_uncertainty."
-                )
+    def get_gross_profit(self) -> np.ndarray:
+        return self._evaluate("gross_profit")
 
-            # Estimates the revenue matrix and adds it to the output matrix.
-            scenario_estimate_revenue_matrix = self._estimated_matrix(
-                estimate["revenue"],
-                estimate["revenue_uncertainty"],
-                self.current["revenue"],
-                samples,
-            )
-            try:
-                estimate_revenue_matrix = np.append(
-                    estimate_revenue_matrix, scenario_estimate_revenue_matrix, axis=0
-                )
-            except NameError:
-                estimate_revenue_matrix = scenario_estimate_revenue_matrix
+    def get_deprication_amortization(self) -> np.ndarray:
+        return self._evaluate("deprication_amortization")
 
-        self.output["revenue"] = estimate_revenue_matrix
-        return estimate_revenue_matrix
+    def get_interest_expense(self) -> np.ndarray:
+        return self._evaluate("interest_expense")
 
-    def get_gross_margin(self) -> np.ndarray:
-        if not "gross_margin" in self.current.keys():
-            print(
-                "The current dictionary must have a field called gross_margin, which should contain the latest known gross_margin."
-            )
+    def get_net_working_capital(self) -> np.ndarray:
+        return self._evaluate("net_working_capital")
 
-        for estimate, samples in zip(self.estimates, self.output["samples"]):
-            # For each of the scenarios the estimated gross margin matrix must be set and added to the output matrix.
-            if (
-                not "gross_margin" in estimate.keys()
-                or not "gross_margin_uncertainty" in estimate.keys()
-            ):
-                print(
-                    "The estimate dictionary must have fields called gross_margin and gross_margin_uncertainty."
-                )
+    def get_ebit_margin(self) -> np.ndarray:
+        return self._evaluate("ebit_margin")
 
-            # Estimates the gross margin matrix and adds it to the output matrix.
-            scenario_estimate_gross_margin_matrix = self._estimated_matrix(
-                estimate["gross_margin"],
-                estimate["gross_margin_uncertainty"],
-                self.current["gross_margin"],
-                samples,
-            )
-            try:
-                estimate_gross_margin_matrix = np.append(
-                    estimate_gross_margin_matrix,
-                    scenario_estimate_gross_margin_matrix,
-                    axis=0,
-                )
-            except NameError:
-                estimate_gross_margin_matrix = scenario_estimate_gross_margin_matrix
+    def get_sga(self) -> np.ndarray:
+        return self._evaluate("selling_general_admin_expense")
 
-        self.output["gross_margin"] = estimate_gross_margin_matrix
-        return estimate_gross_margin_matrix
+    def get_net_income(self) -> np.ndarray:
+        return self._evaluate("net_income")
 
-    def get_gross_profit(self) -> np.ndarray:
-        revenue = self.get_revenue()
-        gross_margin = self.get_gross_margin()
-        gross_profit = revenue * gross_margin
-        self.output["gross_profit"] = gross_profit
-        return gross_profit
+    def get_free_cashflow(self) -> np.ndarray:
+        return self._evaluate("free_cashflow")
 
-    def get_deprication_amortization(self) -> np.ndarray:
-        if not "deprication_amortization" in self.current.keys():
-            print(
-                "The current dictionary must have a field called deprication_amortization, which should contain the latest known deprication_amortization."
-            )
+    def get_discount_factor(self) -> np.ndarray:
+        """Creating the discount factor of each period, which is the same for all samples.
 
-        for estimate, samples in zip(self.estimates, self.output["samples"]):
-            # For each of the scenarios the estimated gross margin matrix must be set and added to the output matrix.
-            if (
-                not "deprication_amortization" in estimate.keys()
-                or not "deprication_amortization_uncertainty" in estimate.keys()
-            ):
-                print(
-                    "The estimate dictionary must have fields called deprication_amortization and deprication_amortization_uncertainty."
-                )
+        Returns:
+            np.ndarray: An array with length n_periods, which the free cash flow in each period is divided by.
+        """
+        return np.power(
+            1 + self.wacc, np.arange(1, self.n_periods + 1, dtype=self.dtype)
+        )
 
-            # Estimates the gross margin matrix and adds it to the output matrix.
-            scenario_estimate_deprication_amortization_matrix = self._estimated_matrix(
-                estimate["deprication_amortization"],
-                estimate["deprication_amortization_uncertainty"],
-                self.current["deprication_amortization"],
-                samples,
-            )
-            try:
-                estimate_deprication_amortization_matrix = np.append(
-                    estimate_deprication_amortization_matrix,
-                    scenario_estimate_deprication_amortization_matrix,
-                    axis=0,
-                )
-            except NameError:
-                estimate_deprication_amortization_matrix = (
-                    scenario_estimate_deprication_amortization_matrix
-                )
+    def get_discounted_company_value(self) -> np.ndarray:
+        return self._evaluate("company_value")
 
-        self.output[
-            "deprication_amortization"
-        ] = estimate_deprication_amortization_matrix
-        return estimate_deprication_amortization_matrix
+    def get_fair_value_per_share(self) -> np.array:
+        return self._evaluate("fair_value_per_share")
 
-    def get_interest_expense(self) -> np.ndarray:
-        if not "interest_expense" in self.current.keys():
-            print(
-                "The current dictionary must have a field called interest_expense, which should contain the latest known interest_expense."
-            )
+    def get_company_value_sensitivity(
+        self,
+        wacc: np.ndarray,
+        perpetual_rate: np.ndarray,
+        summary: bool = False,
+        quantiles: tuple = (0.05, 0.5, 0.95),
+    ) -> np.ndarray | dict:
+        """Calculating the discounted company value for a grid of wacc and perpetual rates with the same sampled free cash flows.
+        The company value is linear in the free cash flow, so for each sample it is the present value of the
+        forecast periods (depending on the wacc) plus the last free cash flow times a terminal multiplier
+        (depending on both the wacc and the perpetual rate). Thereby no discount matrix per sample is needed.
+
+        Args:
+            wacc (np.ndarray): The wacc values of the grid.
+            perpetual_rate (np.ndarray): The perpetual rates of the grid.
+            summary (bool, optional): If True only the summary statistics of each grid point are returned. Defaults to False.
+            quantiles (tuple, optional): The quantiles included in the summary. Defaults to (0.05, 0.5, 0.95).
 
-        for estimate, samples in zip(self.estimates, self.output["samples"]):
-            # For each of the scenarios the estimated gross margin matrix must be set and added to the output matrix.
-            if (
-                not "interest_expense" in estimate.keys()
-                or not "interest_expense_uncertainty" in estimate.keys()
-            ):
-                print(
-                    "The estimate dictionary must have fields called interest_expense and interest_expense_uncertainty."
-                )
+        Returns:
+            np.ndarray | dict: Either the company values with shape len(wacc)*len(perpetual_rate)*n_samples,
+                or a dictionary with the mean, std and quantiles of the company value with shape len(wacc)*len(perpetual_rate)
+                (the quantiles have an extra leading axis with one entry per quantile).
+        """
+        wacc = np.atleast_1d(np.asarray(wacc, dtype=float))
+        perpetual_rate = np.atleast_1d(np.asarray(perpetual_rate, dtype=float))
+        fcf = self.get_free_cashflow()
+
+        # Present value of the forecast periods for each sample and wacc.
+        discount = np.power(1 + wacc.reshape(-1, 1), -np.arange(1, self.n_periods + 1))
+        present_value = fcf @ discount.T
+        # The terminal value of each sample is the last free cash flow times this multiplier.
+        terminal_multiplier = (
+            (1 + perpetual_rate)
+            / (wacc.reshape(-1, 1) - perpetual_rate)
+            * discount[:, -1:]
+        )
+        last_fcf = fcf[:, -1]
 
-            # Estimates the gross margin matrix and adds it to the output matrix.
-            scenario_estimate_interest_expense_matrix = self._estimated_matrix(
-                estimate["interest_expense"],
-                estimate["interest_expense_uncertainty"],
-                self.current["interest_expense"],
-                samples,
+        if not summary:
+            return (
+                present_value.T[:, None, :] + terminal_multiplier[:, :, None] * last_fcf
             )
-            try:
-                estimate_interest_expense_matrix = np.append(
-                    estimate_interest_expense_matrix,
-                    scenario_estimate_interest_expense_matrix,
-                    axis=0,
-                )
-            except NameError:
-                estimate_interest_expense_matrix = (
-                    scenario_estimate_interest_expense_matrix
-                )
 
-        self.output["interest_expense"] = estimate_interest_expense_matrix
-        return estimate_interest_expense_matrix
+        # The mean and variance follow directly from the moments of the two terms.
+        mean_present_value = present_value.mean(axis=0)
+        mean_last_fcf = last_fcf.mean()
+        covariance = (
+            (present_value - mean_present_value)
+            * (last_fcf - mean_last_fcf).reshape(-1, 1)
+        ).mean(axis=0)
+        variance = (
+            present_value.var(axis=0).reshape(-1, 1)
+            + terminal_multiplier**2 * last_fcf.var()
+            + 2 * terminal_multiplier * covariance.reshape(-1, 1)
+        )
 
-    def get_net_working_capital(self) -> np.ndarray:
-        if not "net_working_capital" in self.current.keys():
-            print(
-                "The current dictionary must have a field called net_working_capital, which should contain the latest known net_working_capital."
+        # The quantiles need the values, so they are calculated one wacc at a time to limit the memory.
+        value_quantiles = np.empty((len(quantiles), len(wacc), len(perpetual_rate)))
+        for i in range(len(wacc)):
+            values = (
+                present_value[:, i] + terminal_multiplier[i].reshape(-1, 1) * last_fcf
             )
+            value_quantiles[:, i, :] = np.quantile(values, quantiles, axis=1)
 
-        for estimate, samples in zip(self.estimates, self.output["samples"]):
-            # For each of the scenarios the estimated gross margin matrix must be set and added to the output matrix.
-            if (
-                not "net_working_capital" in estimate.keys()
-                or not "net_working_capital_uncertainty" in estimate.keys()
-            ):
-                print(
-                    "The estimate dictionary must have fields called net_working_capital and net_working_capital_uncertainty."
-                )
+        return {
+            "mean": mean_present_value.reshape(-1, 1)
+            + terminal_multiplier * mean_last_fcf,
+            "std": np.sqrt(np.maximum(variance, 0)),
+            "quantiles": value_quantiles,
+        }
 
-            # Estimates the gross margin matrix and adds it to the output matrix.
-            scenario_estimate_net_working_capital_matrix = self._estimated_matrix(
-                estimate["net_working_capital"],
-                estimate["net_working_capital_uncertainty"],
-                self.current["net_working_capital"],
-                samples,
-            )
-            try:
-                estimate_net_working_capital_matrix = np.append(
-                    estimate_net_working_capital_matrix,
-                    scenario_estimate_net_working_capital_matrix,
-                    axis=0,
-                )
-            except NameError:
-                estimate_net_working_capital_matrix = (
-                    scenario_estimate_net_working_capital_matrix
-                )
+    def iter_fair_value_per_share(self, chunk_size: int = 100000):
+        """Simulating the fair value per share in chunks of at most chunk_size samples.
+        Each chunk is simulated by its own forecast of a single scenario, so only one chunk of
+        the intermediate matrices (revenue, margins, cash flows etc.) is kept in memory at a time.
 
-        self.output["net_working_capital"] = estimate_net_working_capital_matrix
-        return estimate_net_working_capital_matrix
-
-    def get_ebit_margin(self) -> np.ndarray:
-        if not "ebit_margin" in self.current.keys():
-            print(
-                "The current dictionary must have a field called ebit_margin, which should contain the latest known ebit_margin."
-            )
+        Args:
+            chunk_size (int, optional): The maximum number of samples in each chunk. Defaults to 100000.
 
+        Yields:
+            np.ndarray: The fair value per share of the samples in the chunk.
+        """
         for estimate, samples in zip(self.estimates, self.output["samples"]):
-            # For each of the scenarios the estimated gross margin matrix must be set and added to the output matrix.
-            if (
-                not "ebit_margin" in estimate.keys()
-                or not "ebit_margin_uncertainty" in estimate.keys()
-            ):
-                print(
-                    "The estimate dictionary must have fields called ebit_margin and ebit_margin_uncertainty."
-                )
+            for start in range(0, samples, chunk_size):
+                yield self._chunk_forecast(
+                    estimate, min(chunk_size, samples - start), self.rng
+                ).get_fair_value_per_share()
+
+    def get_streaming_summary(
+        self,
+        chunk_size: int = 100000,
+        n_bins: int = 1000,
+        quantiles: tuple = (0.05, 0.5, 0.95),
+    ) -> dict:
+        """Summarising the distribution of the fair value per share by simulating it in chunks.
+        The chunks are folded into online accumulators, so the memory use doesn't depend on n_samples.
+        Samples that are not finite (e.g. from a negative estimate) are left out of all of the statistics and counted in dropped.
+
+        Args:
+            chunk_size (int, optional): The maximum number of samples in each chunk. Defaults to 100000.
+            n_bins (int, optional): The number of bins in the histogram. Defaults to 1000.
+            quantiles (tuple, optional): The quantiles to estimate from the histogram. Defaults to (0.05, 0.5, 0.95).
 
-            # Estimates the gross margin matrix and adds it to the output matrix.
-            scenario_estimate_ebit_margin_matrix = self._estimated_matrix(
-                estimate["ebit_margin"],
-                estimate["ebit_margin_uncertainty"],
-                self.current["ebit_margin"],
-                samples,
+        Returns:
+            dict: The mean, std and quantiles of the fair value per share, the histogram and the number of dropped samples.
+        """
+        moments = OnlineMoments()
+        histogram = StreamingHistogram(n_bins)
+        for fair_value_per_share in self.iter_fair_value_per_share(chunk_size):
+            moments.update(fair_value_per_share)
+            histogram.update(fair_value_per_share)
+        if moments.dropped > 0:
+            print(
+                f"{moments.dropped} of {moments.dropped + moments.count} samples of the fair value per share are not finite and have been left out."
             )
-            try:
-                estimate_ebit_margin_matrix = np.append(
-                    estimate_ebit_margin_matrix,
-                    scenario_estimate_ebit_margin_matrix,
-                    axis=0,
-                )
-            except NameError:
-                estimate_ebit_margin_matrix = scenario_estimate_ebit_margin_matrix
 
-        self.output["ebit_margin"] = estimate_ebit_margin_matrix
-        return estimate_ebit_margin_matrix
+        return {
+            "mean": moments.mean,
+            "std": moments.std,
+            "quantiles": histogram.quantile(quantiles),
+            "histogram": histogram,
+            "dropped": moments.dropped,
+        }
 
-    def get_sga(self) -> np.ndarray:
-        if not "gross_profit" in self.output.keys():
-            self.get_gross_profit()
-        gross_profit = self.output["gross_profit"]
-        if not "deprication_amortization" in self.output.keys():
-            self.get_deprication_amortization()
-        deprication_amortization = self.output["deprication_amortization"]
+    def get_fair_value_per_share_parallel(self, n_workers: int = None) -> np.ndarray:
+        """Simulating the fair value per share in a pool of processes.
+        The samples of each scenario are split evenly across the workers, and each worker draws its samples from
+        its own random stream spawned from the seed of the forecast. Thereby the result is the same for a given
+        seed and number of workers. The result is not stored in the output, as the intermediate line items
+        only exist in the workers.
 
-        if not "ebit_margin" in self.output.keys():
-            self.get_ebit_margin()
-        ebit_margin = self.output["ebit_margin"]
+        Args:
+            n_workers (int, optional): The number of processes. Defaults to the number of CPUs.
 
-        sga = gross_profit - deprication_amortization - ebit_margin
+        Returns:
+            np.ndarray: An array with length n_samples with the fair value per share, ordered by scenario like get_fair_value_per_share().
+        """
+        n_workers = n_workers or os.cpu_count()
+        seed = self.seed
+        if isinstance(seed, np.random.Generator):
+            seed = int(seed.integers(2**63))
+        seed_sequences = np.random.SeedSequence(seed).spawn(n_workers)
+
+        # The number of samples of each scenario that each worker simulates.
+        worker_samples = [
+            [
+                samples // n_workers + (worker < samples % n_workers)
+                for samples in self.output["samples"]
+            ]
+            for worker in range(n_workers)
+        ]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(
+                executor.map(
+                    _simulate_fair_value_per_share,
+                    [self] * n_workers,
+                    worker_samples,
+                    seed_sequences,
+                )
+            )
 
-        self.output["selling_general_admin_expense"] = sga
-        return sga
+        # Putting the samples of each worker into the block of its scenario.
+        fair_value_per_share = np.empty(self.n_samples, dtype=self.dtype)
+        position = 0
+        for scenario in range(len(self.estimates)):
+            for result in results:
+                chunk = result[scenario]
+                fair_value_per_share[position : position + len(chunk)] = chunk
+                position += len(chunk)
+        return fair_value_per_share
 
-    def get_net_income(self) -> np.ndarray:
-        if not "revenue" in self.output.keys():
-            self.get_revenue()
-        revenue = self.output["revenue"]
-        if not "ebit_margin" in self.output.keys():
-            self.get_ebit_margin()
-        ebit_margin = self.output["ebit_margin"]
-        if not "interest_expense" in self.output.keys():
-            self.get_interest_expense()
-        interest_expense = self.output["interest_expense"]
-        profit_before_tax = revenue * ebit_margin - interest_expense
-        tax = profit_before_tax * self.tax_rate
-        net_income = profit_before_tax - tax
-
-        self.output["net_income"] = net_income
-        return net_income
+    def resample(self) -> None:
+        """Removing all calculated line items, so the drivers are sampled again the next time they are needed."""
+        for line_item in self.LINE_ITEMS.keys():
+            self.output.pop(line_item, None)
+        self._cache_keys = {}
 
-    def get_free_cashflow(self) -> np.ndarray:
+    def _evaluate(self, line_item: str) -> np.ndarray:
+        """Getting a line item from the graph in LINE_ITEMS.
+        The line item is only calculated if it hasn't been calculated before, or if one of its
+        inputs or parameters have changed since it was calculated.
 
-        # Calculating net income
-        if not "net_income" in self.output.keys():
-            self.get_net_income()
-        net_income = self.output["net_income"]
-
-        # Calculating free cash flow
-        if not "net_working_capital" in self.output.keys():
-            self.get_net_working_capital()
-        nwc = self.output["net_working_capital"]
-        if not "interest_expense" in self.output.keys():
-            self.get_interest_expense()
-        int_exp = self.output["interest_expense"]
-        if not "deprication_amortization" in self.output.keys():
-            self.get_deprication_amortization()
-        dep_amort = self.output["deprication_amortization"]
-        capex = dep_amort  # WHY?
-        fcf = net_income - int_exp - dep_amort + nwc + capex
-
-        self.output["free_cashflow"] = fcf
-        return fcf
+        Args:
+            line_item (str): The name of the line item, which must be a key in LINE_ITEMS.
 
-    def get_discount_factor(self) -> np.ndarray:
-        arr_periods = np.ones((self.n_samples, self.n_periods)) * np.linspace(
-            1, self.n_periods, self.n_periods
+        Returns:
+            np.ndarray: The line item.
+        """
+        inputs, parameters = self.LINE_ITEMS[line_item]
+        input_values = [self._evaluate(name) for name in inputs]
+
+        # The key changes whenever a parameter changes or an input has been recalculated.
+        cache_key = (
+            tuple(getattr(self, parameter) for parameter in parameters),
+            tuple(self._versions[name] for name in inputs),
+        )
+        if (
+            line_item in self.output.keys()
+            and self._cache_keys.get(line_item) == cache_key
+        ):
+            return self.output[line_item]
+
+        if line_item in self.DRIVERS:
+            value = self._sample_driver(line_item)
+        else:
+            value = getattr(self, "_calculate_" + line_item)(*input_values)
+
+        self.output[line_item] = value
+        self._cache_keys[line_item] = cache_key
+        self._versions[line_item] = self._versions.get(line_item, 0) + 1
+        return value
+
+    def _calculate_gross_profit(self, revenue, gross_margin) -> np.ndarray:
+        return revenue * gross_margin
+
+    def _calculate_selling_general_admin_expense(
+        self, gross_profit, deprication_amortization, ebit_margin
+    ) -> np.ndarray:
+        return gross_profit - deprication_amortization - ebit_margin
+
+    def _calculate_net_income(
+        self, revenue, ebit_margin, interest_expense
+    ) -> np.ndarray:
+        return net_income(revenue, ebit_margin, interest_expense, self.tax_rate)
+
+    def _calculate_free_cashflow(
+        self,
+        net_income,
+        net_working_capital,
+        interest_expense,
+        deprication_amortization,
+    ) -> np.ndarray:
+        return free_cashflow(
+            net_income, net_working_capital, interest_expense, deprication_amortization
         )
-        discount_factor = np.power(1 + self.wacc, arr_periods)
-        return discount_factor
 
-    def get_discounted_company_value(self) -> np.ndarray:
-        if not "free_cashflow" in self.output.keys():
-            self.get_free_cashflow()
-        fcf = self.output["free_cashflow"]
-        discount_factor = self.get_discount_factor()
-        npv = fcf / discount_factor
-
-        terminal_value = (
-            fcf[:, -1]
-            * (1 + self.perpetual_rate)
-            / (self.wacc - self.perpetual_rate)
-            / discount_factor[:, -1]
+    def _calculate_company_value(self, free_cashflow) -> np.ndarray:
+        return discounted_company_value(
+            free_cashflow, self.get_discount_factor(), self.wacc, self.perpetual_rate
         )
 
-        company_value = np.sum(npv, axis=1) + terminal_value
+    def _calculate_fair_value_per_share(self, company_value) -> np.ndarray:
+        # Repeating the number of shares for each scenario so it can divide the discounted
+        # company value and thereby calculate the current value of the shares.
+        shares = np.repeat(
+            np.array([estimate["shares"] for estimate in self.estimates], self.dtype),
+            self.output["samples"],
+        )
+        return company_value / shares
+
+    def __getstate__(self) -> dict:
+        # Leaving out the line items, so the forecast is cheap to send to worker processes.
+        state = self.__dict__.copy()
+        state["output"] = {
+            key: value
+            for key, value in self.output.items()
+            if not key in self.LINE_ITEMS.keys()
+        }
+        state["_cache_keys"] = {}
+        return state
+
+    def _chunk_forecast(
+        self, estimate: dict, samples: int, rng: np.random.Generator
+    ) -> "FinancialForecast":
+        # A forecast with all of its samples drawn from a single scenario.
+        return FinancialForecast(
+            current=self.current,
+            estimates={**estimate, "probability": 1.0},
+            n_periods=self.n_periods,
+            wacc=self.wacc,
+            perpetual_rate=self.perpetual_rate,
+            n_samples=samples,
+            tax_rate=self.tax_rate,
+            seed=rng,
+            dtype=self.dtype,
+        )
 
-        self.output["company_value"] = company_value
-        return company_value
+    def _sample_driver(self, driver: str) -> np.ndarray:
+        """Sampling a driver (e.g. revenue) for all scenarios into a single n_samples*n_periods matrix.
+        The matrix is allocated once and each scenario writes its own block of rows in place,
+        using the number of samples per scenario to find the row offsets.
 
-    def get_fair_value_per_share(self) -> np.array:
-        if not "company_value" in self.output.keys():
-            self.get_discounted_company_value()
+        Args:
+            driver (str): The name of the driver, which must be a key in the current and estimate dictionaries.
 
-        shares_full = []
+        Returns:
+            np.ndarray: An array with shape n_samples*n_periods with the estimated driver in each period for each simulation.
+        """
+        if not driver in self.current.keys():
+            print(
+                f"The current dictionary must have a field called {driver}, which should contain the latest known {driver}."
+            )
 
-        # Adding the number of shares for each scenario so it can divide the discounted
-        # company value and thereby calculate the current value of the shares.
-        for estimate, samples in zip(self.estimates, self.output["samples"]):
+        driver_matrix = np.empty((self.n_samples, self.n_periods), dtype=self.dtype)
+        # The normal draws of each scenario are written into the same buffer.
+        buffer = np.empty(max(self.output["samples"], default=0), dtype=self.dtype)
+        offsets = self.output["offsets"]
+        for estimate, start, end in zip(self.estimates, offsets[:-1], offsets[1:]):
+            # For each of the scenarios the estimated matrix is written into its block of the output matrix.
+            if (
+                not driver in estimate.keys()
+                or not driver + "_uncertainty" in estimate.keys()
+            ):
+                print(
+                    f"The estimate dictionary must have fields called {driver} and {driver}_uncertainty."
+                )
 
-            # shares = [estimate['shares']]*samples
-            [shares_full.append(estimate["shares"]) for _ in range(samples)]
-            # shares_full = [item for sublist in shares_full for item in sublist]  # Flattening
+            self._estimated_matrix(
+                estimate[driver],
+                estimate[driver + "_uncertainty"],
+                self.current[driver],
+                end - start,
+                out=driver_matrix[start:end],
+                buffer=buffer[: end - start],
+            )
 
-        fair_value_per_share = self.output["company_value"] / np.array(shares_full)
-        self.output["fair_value_per_share"] = fair_value_per_share
-        return fair_value_per_share
+        return driver_matrix
 
-    def _estimated_matrix(self, estimate, uncertainty, current, samples):
-        arr_periods = np.ones((samples, self.n_periods)) * np.linspace(
-            1, self.n_periods, self.n_periods
-        )
+    def _estimated_matrix(
+        self, estimate, uncertainty, current, samples, out=None, buffer=None
+    ):
+        periods = np.arange(1, self.n_periods + 1, dtype=self.dtype)
 
-        arr_estimate = np.random.normal(estimate, uncertainty, samples)
+        arr_estimate = self.rng.standard_normal(samples, dtype=self.dtype, out=buffer)
+        arr_estimate *= uncertainty
+        arr_estimate += estimate
         arr_cagr = cagr(current, arr_estimate, self.n_periods)
-        arr_cagr_multiplier = np.power(1 + arr_cagr.reshape(samples, 1), arr_periods)
-        estimated_matrix = current * arr_cagr_multiplier
+        estimated_matrix = np.power(1 + arr_cagr.reshape(samples, 1), periods, out=out)
+        estimated_matrix *= current
         return estimated_matrix
 
 
+def _simulate_fair_value_per_share(
+    forecast: FinancialForecast, samples: list, seed_sequence: np.random.SeedSequence
+) -> list:
+    # Simulating a number of samples of each scenario in a worker with its own random stream.
+    rng = np.random.default_rng(seed_sequence)
+    return [
+        forecast._chunk_forecast(
+            estimate, scenario_samples, rng
+        ).get_fair_value_per_share()
+        for estimate, scenario_samples in zip(forecast.estimates, samples)
+    ]
+
+
+def net_income(revenue, ebit_margin, interest_expense, tax_rate) -> np.ndarray:
+    profit_before_tax = revenue * ebit_margin - interest_expense
+    tax = profit_before_tax * tax_rate
+    return profit_before_tax - tax
+
+
+def free_cashflow(
+    net_income, net_working_capital, interest_expense, deprication_amortization
+) -> np.ndarray:
+    capex = deprication_amortization  # WHY?
+    return (
+        net_income
+        - interest_expense
+        - deprication_amortization
+        + net_working_capital
+        + capex
+    )
+
+
+def discounted_company_value(
+    free_cashflow, discount_factor, wacc, perpetual_rate
+) -> np.ndarray:
+    """Discounting the free cash flows and adding the discounted terminal value.
+    The periods must be the last axis, so it works for a single company (samples*periods)
+    as well as for many companies at once (companies*samples*periods).
+
+    Args:
+        free_cashflow (np.ndarray): The free cash flow in each period.
+        discount_factor (np.ndarray): The discount factor of each period, which must broadcast with the free cash flow.
+        wacc (float | np.ndarray): The weighted average cost of capital.
+        perpetual_rate (float | np.ndarray): The growth rate after the last period.
+
+    Returns:
+        np.ndarray: The discounted company value, i.e. the free cash flow without the period axis.
+    """
+    npv = free_cashflow / discount_factor
+
+    terminal_value = (
+        free_cashflow[..., -1]
+        * (1 + perpetual_rate)
+        / (wacc - perpetual_rate)
+        / discount_factor[..., -1]
+    )
+
+    return np.sum(npv, axis=-1) + terminal_value
+
+
 def cagr(start_value, end_value, periods) -> float:
     # Make sure that it can handle negative start or end values.
     cagr = (end_value * 1.0 / start_value) ** (1.0 / periods) - 1
@@ -9,7 +9,7 @@ st.set_page_config(
 # Setting states
 st.session_state["main_ticker"] = ""
 st.session_state["peer_list"] = []
-st.session_state["data"] = None
+st.session_state["panel"] = None
 for peer in range(1, 10):
     peer_idx = "peer" + str(peer)
     if peer_idx + "_name" not in st.session_state:
@@ -1,6 +1,6 @@
 import streamlit as st
-from utils.yf_extractor import YahooExtractor
-import pandas as pd
+from utils.yf_extractor import VALUATION_METRICS
+from utils.app_cache import get_recommended_symbols, get_stats
 
 
 def main():
@@ -26,8 +26,7 @@ def main():
     ):
 
         # The recommended symbols from Yahoo Finance (if any)
-        main_ticker = YahooExtractor(company_ticker)
-        suggested_peers = main_ticker.get_recommended_symbols()
+        suggested_peers = get_recommended_symbols(company_ticker)
         if suggested_peers is not None:
             suggested_peers = ", ".join(suggested_peers)
             st.write("Suggested peers", suggested_peers)
@@ -52,30 +51,29 @@ def main():
         ] = peer_list  # Remembering the list of peers for the analysis page.
 
         if st.button("Add Peers", key="add_peers"):
-            full_df = main_ticker.get_stats()
-            full_df["ticker"] = company_ticker
-
             # Adding a progress bar for loading the data
             progress_text = "Loading data from yahoo"
             yahoo_extract_progress = st.progress(
                 0, text=progress_text
             )  # If users move too fast the data won't be stored.
 
-            for i, peer in enumerate(peer_list):
-                # Extracting data for each peer and adding it to the dataframe
-                ticker_df = YahooExtractor(peer).get_stats()
-                ticker_df["ticker"] = peer
-
-                full_df = pd.concat([full_df, ticker_df], ignore_index=True)
-
-                progress = (i + 1.0) / (
-                    number_of_peers + 1.0
+            def update_progress(finished: int, total: int, ticker: str):
+                progress = finished / (
+                    total + 1.0
                 )  # Adding one so the final step is when the data is stored
                 yahoo_extract_progress.progress(progress, text=progress_text)
 
+            # Extracting the valuation metrics for the primary ticker and each peer concurrently.
+            # The analysis page extracts the metric it shows when it is selected.
+            panel = get_stats(
+                tuple([company_ticker] + peer_list),
+                tuple(VALUATION_METRICS),
+                _callback=update_progress,
+            )
+
             st.session_state[
-                "data"
-            ] = full_df  # Storing the data for the analysis page.
+                "panel"
+            ] = panel  # Storing the data for the valuation page.
             yahoo_extract_progress.progress(1.0, text="Done loading data")
 
 
@@ -1,39 +1,69 @@
 import streamlit as st
-from utils.plotter import Plotter
-from utils.yf_extractor import YahooExtractor
+from utils.yf_extractor import METRICS
+from utils.app_cache import (
+    get_development_figure,
+    get_peer_stats,
+    get_snapshot_figure,
+    get_stats,
+)
+from utils.peer_stats import get_latest_peer_stats
 
 
 def main():
     # Extracting data from previous page
     primary_ticker_name = st.session_state["main_ticker"]
-    main_ticker = YahooExtractor(primary_ticker_name)
     peer_list = st.session_state["peer_list"]
-    full_df = st.session_state["data"]
 
     st.write(f"The main ticker is {primary_ticker_name}")
     st.write(f"The peers are {', '.join(peer_list)}")
 
+    # Showing where the primary ticker sits among its peers for every metric
+    latest = get_latest_peer_stats(
+        get_peer_stats(primary_ticker_name, tuple(peer_list))
+    )
+    st.dataframe(
+        latest.assign(metric=latest["metric"].map(METRICS).astype(str))[
+            ["metric", "date", "value", "median", "p25", "p75", "z_score", "rank"]
+        ].rename(columns={"value": primary_ticker_name}),
+        hide_index=True,
+    )
+
     # Creating visuals
 
-    # Finding what metrics to show:
+    # Seleting a metric and extracting only that metric for the tickers
+    chosen_metric = st.selectbox(
+        label="Selected Metric",
+        options=list(METRICS.keys()),
+        format_func=lambda metric: METRICS[metric],
+    )
+    panel = get_stats(tuple([primary_ticker_name] + peer_list), (chosen_metric,))
+
     total_tickers = len(peer_list) + 1
     ticker_limit = (
         total_tickers * 0.75
-    )  # At least 75 % of the tickers must be represented in the metric before it is shown.
-    metric_df = full_df.groupby(["metric"])["ticker"].nunique().reset_index()
-    metrics = metric_df[metric_df["ticker"] >= ticker_limit]["metric"].tolist()
+    )  # At least 75 % of the tickers should be represented in the metric.
+    if panel.coverage.get(chosen_metric, 0) < ticker_limit:
+        st.write(f"{METRICS[chosen_metric]} is missing for many of the tickers.")
 
-    # Seleting a metric and adapting the df to it
-    chosen_metric = st.selectbox(label="Selected Metric", options=metrics)
-    df = full_df[full_df["metric"] == chosen_metric].copy()
-    df[chosen_metric] = df["value"]
+    if len(panel.dates) == 0:
+        st.write(f"There is no data for {METRICS[chosen_metric]}.")
+        return
 
-    # Plotting
-    p = Plotter(df, primary_ticker=primary_ticker_name, peers=peer_list)
+    # The bar plot compares the last value of each ticker at or before the selected date.
+    as_of = st.date_input(
+        "As of",
+        value=panel.dates[-1].date(),
+        min_value=panel.dates[0].date(),
+        max_value=panel.dates[-1].date(),
+    )
 
-    development_plot = p.line(y_col=chosen_metric)
-    mask = (df["date"] == "2023-03-31").tolist()
-    current_state_plot = p.bar(y_col=chosen_metric, mask=df["date"] == "2023-03-31")
+    # Plotting, where the figures are cached by the metric, the date and the tickers.
+    development_plot = get_development_figure(
+        primary_ticker_name, tuple(peer_list), chosen_metric
+    )
+    current_state_plot = get_snapshot_figure(
+        primary_ticker_name, tuple(peer_list), chosen_metric, as_of
+    )
 
     st.plotly_chart(current_state_plot)
     st.plotly_chart(development_plot)
@@ -1,30 +1,50 @@
 import streamlit as st
-from utils.simulation import MonteCarloSimulation
+from utils.app_cache import get_valuation_priors, simulate_valuation
 from utils.styling import PrimaryColors
 import plotly.graph_objects as go
-import plotly.express as px
 import numpy as np
 
 
 def create_fig(
-    estimates, current: float = None, x_format: str = None, **kwargs
+    estimates,
+    current: float = None,
+    x_format: str = None,
+    n_bins: int = 100,
+    title: str = None,
+    labels: dict = None,
 ) -> go.Figure:
     """Creating a histogram figure based on the estimates and with a line for the current/base value. 
     This will create a graph of the distribution of the estimates.
+    The estimates are binned here, so only the density of each bin is sent to the browser instead of every estimate.
 
     Args:
         estimates (np.ndarray): An array of estimated values.
         current (float, optional): The current/base value - used to plotting a line. Defaults to None.
         x_format (str, optional): The format of the x axis ticks - can be adjusted to "%" for % values.. Defaults to None.
+        n_bins (int, optional): The number of bins of the histogram. Defaults to 100.
+        title (str, optional): The title of the graph. Defaults to None.
+        labels (dict, optional): The label of the x axis as {"value": label}. Defaults to None.
 
     Returns:
         go.Figure: The graph.
     """
-    fig = px.histogram(
-        estimates,
-        histnorm="probability density",
-        color_discrete_sequence=[PrimaryColors.PURPLE.value],
-        **kwargs,
+    fig = go.Figure()
+    estimates = np.asarray(estimates if estimates is not None else [], dtype=float)
+    estimates = estimates[np.isfinite(estimates)]
+    if estimates.size > 0:
+        density, edges = np.histogram(estimates, bins=n_bins, density=True)
+        fig.add_trace(
+            go.Bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=density,
+                width=np.diff(edges),
+                marker=dict(color=PrimaryColors.PURPLE.value, line=dict(width=0)),
+            )
+        )
+    fig.update_layout(
+        title=title,
+        bargap=0,
+        xaxis=dict(title=(labels or {}).get("value")),
     )
     if x_format is not None:
         fig.update_layout(xaxis=dict(tickformat="0%"))
@@ -69,18 +89,34 @@ def valuation_overview(
     kpi_current: float = 0,
     key: str = "",
     wanted_cagr: float = 0.0,
+    prior: dict = None,
 ):
     if kpi_current != 0:
         financial_current = market_cap * 1.0 / kpi_current
     else:
         financial_current = 0
 
+    # Starting from the spread of the KPI among the peers and the yearly growth spread of the financial if they are known.
+    kpi_std_default = kpi_current / 25
+    financial_std_default = financial_current / 25.0
+    if prior is not None and prior["n"] > 1:
+        st.write(
+            f"Among the peers the KPI has been between {round(prior['quantiles'][0.05], 1)} and {round(prior['quantiles'][0.95], 1)} (5 % - 95 %) with a median of {round(prior['quantiles'][0.5], 1)}."
+        )
+        kpi_std_default = prior["std"]
+        if np.isfinite(prior["financial_growth_std"]):
+            financial_std_default = (
+                abs(financial_current)
+                * prior["financial_growth_std"]
+                * np.sqrt(periods)
+            )
+
     kpi_c1, kpi_c2 = st.columns(2)
     kpi_estimate = kpi_c1.number_input(
         "Estimated", key="kpi_estimate_" + key, value=round(kpi_current, 0), step=0.1
     )
     kpi_std = kpi_c2.number_input(
-        "Std", key="kpi_std_" + key, value=round(kpi_current / 25, 1), step=0.1
+        "Std", key="kpi_std_" + key, value=round(kpi_std_default, 1), step=0.1
     )
 
     denominator, denominator_str = get_denominator(financial_current)
@@ -99,7 +135,7 @@ def valuation_overview(
         financial_c2.number_input(
             f"Standard deviation of future financial{denominator_str}",
             key="financial_std_" + key,
-            value=round(financial_current * 1.0 / denominator / 25.0, 1),
+            value=round(financial_std_default * 1.0 / denominator, 1),
             step=0.1,
         )
         * denominator
@@ -114,29 +150,30 @@ def valuation_overview(
         "financial_std": financial_std,
     }
 
-    sim = MonteCarloSimulation(**vals)
+    # The simulations are cached, so they are only run again when the inputs change.
+    sim = simulate_valuation(**vals, periods=periods, wanted_cagr=wanted_cagr)
 
     # Figures
     estimated_kpi_fig = create_fig(
-        sim.get_kpi_distribution(),
+        sim["kpi"],
         kpi_current,
         title="Estimated KPI",
         labels={"value": "KPI"},
     )
     estimated_financial_fig = create_fig(
-        sim.get_financial_distribution(),
+        sim["financial"],
         financial_current,
         title="Estimated Financials",
         labels={"value": "Financials"},
     )
     estimated_valuation_fig = create_fig(
-        sim.get_valuation_distribution(),
+        sim["valuation"],
         market_cap,
         title="Estimated Valuation",
         labels={"value": "Estimated Valuation"},
     )
 
-    cagr = sim.get_valuation_cagr_distribution(periods=periods)
+    cagr = sim["cagr"]
     estimated_cagr_fig = create_fig(
         cagr,
         current=wanted_cagr,
@@ -153,8 +190,9 @@ def valuation_overview(
     fig_c21.plotly_chart(estimated_valuation_fig, use_container_width=True)
     fig_c22.plotly_chart(estimated_cagr_fig, use_container_width=True)
 
+    cagr_probability = sim["cagr_probability"]
     st.write(
-        f"There are {str(round(np.mean(cagr>wanted_cagr)*100, 1))} % probability of you getting a better CAGR than your needs based on these estimates."
+        f"There are {str(round(cagr_probability*100, 1))} % probability of you getting a better CAGR than your needs based on these estimates."
     )
 
 
@@ -174,27 +212,19 @@ def main():
     print("")
     print("Starting valuation")
     primary_ticker_name = st.session_state["main_ticker"]
-    full_df = st.session_state["data"]
-    market_cap = full_df[
-        (full_df["ticker"] == primary_ticker_name)
-        & (full_df["metric"] == "quarterlyMarketCap")
-        & (full_df["date"] == "2023-03-31")
-    ]["value"].values[0]
-    price_earnings_forward = full_df[
-        (full_df["ticker"] == primary_ticker_name)
-        & (full_df["metric"] == "quarterlyForwardPeRatio")
-        & (full_df["date"] == "2023-03-31")
-    ]["value"].values[0]
-    price_book = full_df[
-        (full_df["ticker"] == primary_ticker_name)
-        & (full_df["metric"] == "quarterlyPbRatio")
-        & (full_df["date"] == "2023-03-31")
-    ]["value"].values[0]
-    price_sales = full_df[
-        (full_df["ticker"] == primary_ticker_name)
-        & (full_df["metric"] == "quarterlyPsRatio")
-        & (full_df["date"] == "2023-03-31")
-    ]["value"].values[0]
+    panel = st.session_state["panel"]
+    # The latest values, which may be from different quarters if a metric hasn't been reported yet.
+    _, market_cap = panel.get_latest(primary_ticker_name, "quarterlyMarketCap")
+    _, price_earnings_forward = panel.get_latest(
+        primary_ticker_name, "quarterlyForwardPeRatio"
+    )
+    _, price_book = panel.get_latest(primary_ticker_name, "quarterlyPbRatio")
+    _, price_sales = panel.get_latest(primary_ticker_name, "quarterlyPsRatio")
+
+    # The priors are estimated from the history of the primary ticker and its peers.
+    priors = get_valuation_priors(
+        tuple([primary_ticker_name] + st.session_state["peer_list"])
+    )
 
     print("market cap: ", market_cap)
     print("pe: ", price_earnings_forward)
@@ -231,18 +261,27 @@ def main():
             kpi_current=price_earnings_forward,
             key="PE",
             wanted_cagr=wanted_cagr,
+            prior=priors["quarterlyForwardPeRatio"],
         )
 
     with st.expander("Price Sales", expanded=False):
         st.write("something")
         valuation_overview(
-            market_cap=market_cap, periods=periods, kpi_current=price_sales, key="PS"
+            market_cap=market_cap,
+            periods=periods,
+            kpi_current=price_sales,
+            key="PS",
+            prior=priors["quarterlyPsRatio"],
         )
 
     with st.expander("Price Book", expanded=False):
         st.write("something")
         valuation_overview(
-            market_cap=market_cap, periods=periods, kpi_current=price_book, key="PB"
+            market_cap=market_cap,
+            periods=periods,
+            kpi_current=price_book,
+            key="PB",
+            prior=priors["quarterlyPbRatio"],
         )
 
 
@@ -0,0 +1,164 @@
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from .cache import FundamentalsCache
+from .panel import PeerPanel
+from .peer_stats import compute_peer_stats, compute_valuation_priors
+from .plotter import Plotter
+from .simulation import MonteCarloSimulation
+from .yf_extractor import METRICS, VALUATION_METRICS, YahooExtractor
+
+# The cached results are shared by all sessions of the app, so they are bounded in both time and size.
+DATA_TTL = 3600  # Seconds before the fetched data is fetched again.
+SIMULATION_TTL = 24 * 3600  # The simulations only depend on their parameters.
+
+
+@st.cache_resource
+def get_fundamentals_cache() -> FundamentalsCache:
+    """Getting the local cache of the fundamentals, which is shared by all sessions.
+
+    Returns:
+        FundamentalsCache: The cache.
+    """
+    return FundamentalsCache()
+
+
+@st.cache_data(ttl=DATA_TTL, max_entries=256, show_spinner=False)
+def get_recommended_symbols(ticker: str) -> list:
+    """Getting the symbols that yahoo recommends as peers of a ticker.
+
+    Args:
+        ticker (str): The ticker.
+
+    Returns:
+        list: The recommended tickers, or None if there aren't any.
+    """
+    return YahooExtractor(ticker).get_recommended_symbols()
+
+
+@st.cache_data(ttl=DATA_TTL, max_entries=64, show_spinner=False)
+def get_stats(tickers: tuple, metrics: tuple, _callback=None) -> PeerPanel:
+    """Getting the stats of the tickers as a panel.
+
+    Args:
+        tickers (tuple): The tickers.
+        metrics (tuple): The metrics.
+        _callback (callable, optional): The progress callback of YahooExtractor.get_stats_many(),
+            which isn't a part of the cache key (and isn't called when the stats are cached). Defaults to None.
+
+    Returns:
+        PeerPanel: The stats of the tickers.
+    """
+    df = YahooExtractor.get_stats_many(
+        list(tickers),
+        callback=_callback,
+        cache=get_fundamentals_cache(),
+        metrics=list(metrics),
+    )
+    return PeerPanel(df)
+
+
+@st.cache_data(ttl=DATA_TTL, max_entries=64, show_spinner=False)
+def get_peer_stats(primary_ticker: str, peers: tuple) -> pd.DataFrame:
+    """Computing where the primary ticker sits among its peers for all metrics, see compute_peer_stats().
+
+    Args:
+        primary_ticker (str): The primary ticker.
+        peers (tuple): The peers.
+
+    Returns:
+        pd.DataFrame: The peer statistics for each metric and date.
+    """
+    panel = get_stats((primary_ticker,) + peers, tuple(METRICS.keys()))
+    return compute_peer_stats(panel, primary_ticker)
+
+
+@st.cache_data(ttl=DATA_TTL, max_entries=64, show_spinner=False)
+def get_valuation_priors(tickers: tuple) -> dict:
+    """Estimating the priors of the valuation KPIs from the history of the tickers, see compute_valuation_priors().
+
+    Args:
+        tickers (tuple): The primary ticker and its peers.
+
+    Returns:
+        dict: The prior of each valuation KPI.
+    """
+    return compute_valuation_priors(get_stats(tickers, tuple(VALUATION_METRICS)))
+
+
+@st.cache_data(ttl=DATA_TTL, max_entries=128, show_spinner=False)
+def get_development_figure(primary_ticker: str, peers: tuple, metric: str) -> go.Figure:
+    """Creating the line plot of the development in a metric for the primary ticker and its peers.
+
+    Args:
+        primary_ticker (str): The primary ticker.
+        peers (tuple): The peers.
+        metric (str): The metric.
+
+    Returns:
+        go.Figure: The line plot.
+    """
+    df = get_stats((primary_ticker,) + peers, (metric,)).get_history(metric)
+    df[metric] = df["value"]
+    return Plotter(df, primary_ticker=primary_ticker, peers=list(peers)).line(
+        y_col=metric
+    )
+
+
+@st.cache_data(ttl=DATA_TTL, max_entries=128, show_spinner=False)
+def get_snapshot_figure(
+    primary_ticker: str, peers: tuple, metric: str, date
+) -> go.Figure:
+    """Creating the bar plot comparing the last value of a metric at or before a date for the primary ticker and its peers.
+
+    Args:
+        primary_ticker (str): The primary ticker.
+        peers (tuple): The peers.
+        metric (str): The metric.
+        date (str | datetime.date): The date.
+
+    Returns:
+        go.Figure: The bar plot.
+    """
+    snapshot = get_stats((primary_ticker,) + peers, (metric,)).get_snapshot(
+        metric, date
+    )
+    snapshot[metric] = snapshot["value"]
+    return Plotter(snapshot, primary_ticker=primary_ticker, peers=list(peers)).bar(
+        y_col=metric, mask=snapshot["value"].notna()
+    )
+
+
+@st.cache_data(ttl=SIMULATION_TTL, max_entries=32, show_spinner=False)
+def simulate_valuation(
+    kpi_current: float,
+    kpi_estimated: float,
+    kpi_std: float,
+    financial_current: float,
+    financial_estimated: float,
+    financial_std: float,
+    periods: float,
+    wanted_cagr: float,
+) -> dict:
+    """Simulating the valuation like MonteCarloSimulation, so simulations with the same parameters are only run once.
+
+    Returns:
+        dict: The kpi, financial, valuation and cagr distributions and the probability of getting the wanted cagr.
+    """
+    sim = MonteCarloSimulation(
+        kpi_current=kpi_current,
+        kpi_estimated=kpi_estimated,
+        kpi_std=kpi_std,
+        financial_current=financial_current,
+        financial_estimated=financial_estimated,
+        financial_std=financial_std,
+    )
+    return {
+        "kpi": sim.get_kpi_distribution(),
+        "financial": sim.get_financial_distribution(),
+        "valuation": sim.get_valuation_distribution(),
+        "cagr": sim.get_valuation_cagr_distribution(periods=periods),
+        "cagr_probability": sim.get_cagr_probability(
+            periods=periods, wanted_cagr=wanted_cagr
+        ),
+    }
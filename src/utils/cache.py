@@ -0,0 +1,281 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import repeat
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "stock_analytics", "fundamentals.sqlite"
+)
+
+
+class FundamentalsCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = 7 * 24 * 3600,
+        max_rows: int = 1000000,
+    ) -> None:
+        """A local SQLite cache of the fundamentals timeseries from yahoo finance.
+        Each (ticker, metric) series is stored with the period range it was fetched for, so a request for
+        a ticker, a set of metrics and a period range is a hit when all of its series are cached and fresh.
+        When the cache holds more than max_rows observations, the least recently used series are evicted.
+
+        Args:
+            path (str, optional): The path of the SQLite file, ":memory:" keeps the cache in memory. Defaults to ~/.cache/stock_analytics/fundamentals.sqlite.
+            ttl (float, optional): The number of seconds a series is fresh after it has been fetched. Defaults to 7 days.
+            max_rows (int, optional): The maximum number of observations in the cache. Defaults to 1000000.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # The extractor fetches tickers in threads, so the connection is shared behind a lock.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS series (
+                    ticker TEXT,
+                    metric TEXT,
+                    period1 INTEGER,
+                    period2 INTEGER,
+                    fetched_at REAL,
+                    accessed_at REAL,
+                    n_rows INTEGER,
+                    PRIMARY KEY (ticker, metric)
+                );
+                CREATE TABLE IF NOT EXISTS observations (
+                    ticker TEXT,
+                    metric TEXT,
+                    date TEXT,
+                    value REAL,
+                    PRIMARY KEY (ticker, metric, date)
+                );
+                """
+            )
+
+    def get(self, ticker: str, metrics: list, period1: int, period2: int) -> dict:
+        """Getting the observations of the metrics for a ticker, if they are all cached for the period range.
+
+        Args:
+            ticker (str): The ticker.
+            metrics (list): The metrics.
+            period1 (int): The start of the period range as a unix timestamp.
+            period2 (int): The end of the period range as a unix timestamp.
+
+        Returns:
+            dict: A dictionary with a list of metrics, dates and values, or None if it isn't cached.
+        """
+        if self.get_missing_metrics(ticker, metrics, period1, period2):
+            return None
+        return self.read(ticker, metrics, period1, period2)
+
+    def get_missing_metrics(
+        self, ticker: str, metrics: list, period1: int, period2: int
+    ) -> list:
+        """Finding the metrics of a ticker that aren't cached for the period range.
+        A series covers the period range if it was fetched from period1 or earlier, and either up to period2
+        or within the TTL (so recent requests up to now don't have to be fetched again).
+        The lookup is counted as a hit if none of the metrics are missing, otherwise as a miss.
+
+        Args:
+            ticker (str): The ticker.
+            metrics (list): The metrics.
+            period1 (int): The start of the period range as a unix timestamp.
+            period2 (int): The end of the period range as a unix timestamp.
+
+        Returns:
+            list: The metrics that have to be fetched, in the order of the metrics.
+        """
+        with self._lock:
+            cached = self._connection.execute(
+                f"""
+                SELECT metric FROM series
+                WHERE ticker = ? AND metric IN ({self._placeholders(metrics)})
+                AND period1 <= ? AND (period2 >= ? OR fetched_at >= ?)
+                """,
+                [ticker, *metrics, period1, period2, time.time() - self.ttl],
+            ).fetchall()
+            cached = {metric for metric, in cached}
+            missing = [
+                metric for metric in dict.fromkeys(metrics) if not metric in cached
+            ]
+            # The counters are shared by the threads (and sessions) using the cache.
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return missing
+
+    def read(self, ticker: str, metrics: list, period1: int, period2: int) -> dict:
+        """Reading the cached observations of the metrics for a ticker within the period range, without checking if they are fresh.
+
+        Args:
+            ticker (str): The ticker.
+            metrics (list): The metrics.
+            period1 (int): The start of the period range as a unix timestamp.
+            period2 (int): The end of the period range as a unix timestamp.
+
+        Returns:
+            dict: A dictionary with a list of metrics, dates and values.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"""
+                UPDATE series SET accessed_at = ?
+                WHERE ticker = ? AND metric IN ({self._placeholders(metrics)})
+                """,
+                [time.time(), ticker, *metrics],
+            )
+            rows = self._connection.execute(
+                f"""
+                SELECT metric, date, value FROM observations
+                WHERE ticker = ? AND metric IN ({self._placeholders(metrics)})
+                AND date >= ? AND date <= ?
+                """,
+                [ticker, *metrics, _to_date(period1), _to_date(period2)],
+            ).fetchall()
+
+        # Ordering the observations like the requested metrics.
+        order = {metric: i for i, metric in enumerate(metrics)}
+        rows.sort(key=lambda row: (order[row[0]], row[1]))
+        metric, date, value = zip(*rows) if rows else ((), (), ())
+        return {"metric": list(metric), "date": list(date), "value": list(value)}
+
+    def get_refresh_period1(self, ticker: str, metrics: list, period1: int) -> int:
+        """Finding where to start fetching the metrics for a ticker, so only observations newer than the cache are fetched.
+        For each metric this is the date of its last observation (which is fetched again in case it has been revised),
+        or the end of the cached period range if it doesn't have any observations.
+
+        Args:
+            ticker (str): The ticker.
+            metrics (list): The metrics.
+            period1 (int): The start of the wanted period range as a unix timestamp.
+
+        Returns:
+            int: The unix timestamp to start fetching from, which is period1 if any of the metrics aren't cached from period1
+                or there aren't any metrics.
+        """
+        if not metrics:
+            return period1
+        with self._lock:
+            series = self._connection.execute(
+                f"""
+                SELECT series.metric, series.period2, MAX(observations.date)
+                FROM series LEFT JOIN observations
+                ON series.ticker = observations.ticker AND series.metric = observations.metric
+                WHERE series.ticker = ? AND series.metric IN ({self._placeholders(metrics)})
+                AND series.period1 <= ?
+                GROUP BY series.metric, series.period2
+                """,
+                [ticker, *metrics, period1],
+            ).fetchall()
+        if len(series) < len(set(metrics)):
+            return period1
+
+        return min(
+            _to_timestamp(last_date) if last_date is not None else cached_period2
+            for _, cached_period2, last_date in series
+        )
+
+    def merge(
+        self, ticker: str, metrics: list, period1: int, period2: int, columns: dict
+    ) -> None:
+        """Merging fetched observations of the metrics for a ticker into the cache.
+        Observations are identified by their ticker, metric and date, so merging the same observations again doesn't change anything.
+        Metrics without any observations are stored as well, so they don't have to be fetched again.
+
+        Args:
+            ticker (str): The ticker.
+            metrics (list): The metrics that were fetched.
+            period1 (int): The start of the fetched period range as a unix timestamp.
+            period2 (int): The end of the fetched period range as a unix timestamp.
+            columns (dict): A dictionary with a list of metrics, dates and values.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)",
+                zip(
+                    repeat(ticker),
+                    map(str, columns["metric"]),
+                    map(str, columns["date"]),
+                    map(float, columns["value"]),
+                ),
+            )
+            # Extending the period range of cached series, which is only valid if the ranges overlap.
+            self._connection.executemany(
+                """
+                INSERT INTO series VALUES (?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT (ticker, metric) DO UPDATE SET
+                    period1 = CASE WHEN period2 >= excluded.period1
+                        THEN MIN(period1, excluded.period1) ELSE excluded.period1 END,
+                    period2 = MAX(period2, excluded.period2),
+                    fetched_at = excluded.fetched_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                [(ticker, metric, period1, period2, now, now) for metric in metrics],
+            )
+            self._connection.execute(
+                f"""
+                UPDATE series SET n_rows = (
+                    SELECT COUNT(*) FROM observations
+                    WHERE observations.ticker = series.ticker AND observations.metric = series.metric
+                )
+                WHERE ticker = ? AND metric IN ({self._placeholders(metrics)})
+                """,
+                [ticker, *metrics],
+            )
+            self._evict()
+
+    def clear(self) -> None:
+        """Removing everything from the cache."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM series")
+            self._connection.execute("DELETE FROM observations")
+
+    def _evict(self) -> None:
+        # Removing the least recently used series until there are at most max_rows observations.
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(n_rows), 0) FROM series"
+        ).fetchone()[0]
+        if total <= self.max_rows:
+            return
+
+        evicted = []
+        for ticker, metric, n_rows in self._connection.execute(
+            "SELECT ticker, metric, n_rows FROM series ORDER BY accessed_at"
+        ).fetchall():
+            if total <= self.max_rows:
+                break
+            evicted.append((ticker, metric))
+            total -= n_rows
+        self._connection.executemany(
+            "DELETE FROM series WHERE ticker = ? AND metric = ?", evicted
+        )
+        self._connection.executemany(
+            "DELETE FROM observations WHERE ticker = ? AND metric = ?", evicted
+        )
+
+    @staticmethod
+    def _placeholders(values: list) -> str:
+        return ", ".join("?" * len(values))
+
+
+def _to_date(timestamp: int) -> str:
+    # Converting a unix timestamp to the date format used by yahoo finance.
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _to_timestamp(date: str) -> int:
+    # Converting a date in the format used by yahoo finance to a unix timestamp.
+    return int(
+        datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    )
@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+
+class PeerPanel:
+    def __init__(self, data: pd.DataFrame) -> None:
+        """Holding the stats of the tickers as a dense ticker*metric*date cube, so values can be looked up without filtering the dataframe.
+        The latest value of each ticker and metric as of each date, and the number of tickers with each metric,
+        are found when the panel is created, so as-of lookups are a binary search over the sorted dates.
+
+        Args:
+            data (pd.DataFrame): A dataframe with a ticker, metric, date and value column, e.g. from YahooExtractor.get_stats_many().
+        """
+        self.tickers = _categories(data["ticker"])
+        self.metrics = _categories(data["metric"])
+        self.dates = pd.DatetimeIndex(np.unique(data["date"].to_numpy()))
+
+        self.values = np.full(
+            (len(self.tickers), len(self.metrics), len(self.dates)), np.nan
+        )
+        self.values[
+            self.tickers.get_indexer(data["ticker"]),
+            self.metrics.get_indexer(data["metric"]),
+            self.dates.get_indexer(data["date"]),
+        ] = data["value"].to_numpy(dtype=np.float64)
+
+        # The index of the last date with a value as of each date for each ticker and metric, -1 if there are no values yet.
+        observed = ~np.isnan(self.values)
+        self.as_of_index = np.maximum.accumulate(
+            np.where(observed, np.arange(len(self.dates)), -1), axis=2
+        )
+
+        # The number of tickers with at least one value of each metric.
+        self.coverage = pd.Series(
+            observed.any(axis=2).sum(axis=0), index=self.metrics, name="tickers"
+        )
+
+    def get_value(self, ticker: str, metric: str, date) -> float:
+        """Getting the value of a metric for a ticker at a date.
+
+        Args:
+            ticker (str): The ticker.
+            metric (str): The metric.
+            date (str | pd.Timestamp): The date.
+
+        Returns:
+            float: The value, which is nan if there isn't a value at the date.
+        """
+        i, j = self._ticker_loc(ticker), self._metric_loc(metric)
+        k = self.dates.get_indexer([pd.Timestamp(date)])[0]
+        if min(i, j, k) < 0:
+            return np.nan
+        return self.values[i, j, k]
+
+    def get_latest(self, ticker: str, metric: str) -> tuple:
+        """Getting the latest value of a metric for a ticker.
+
+        Args:
+            ticker (str): The ticker.
+            metric (str): The metric.
+
+        Returns:
+            tuple: The date and the value, which are NaT and nan if the ticker doesn't have the metric.
+        """
+        return self.get_as_of(ticker, metric, date=None)
+
+    def get_as_of(self, ticker: str, metric: str, date=None) -> tuple:
+        """Getting the last value of a metric for a ticker at or before a date.
+
+        Args:
+            ticker (str): The ticker.
+            metric (str): The metric.
+            date (str | pd.Timestamp, optional): The date. Defaults to None, which is the latest value.
+
+        Returns:
+            tuple: The date of the value and the value, which are NaT and nan if there isn't a value at or before the date.
+        """
+        i, j = self._ticker_loc(ticker), self._metric_loc(metric)
+        k = self._as_of_loc(date)
+        if min(i, j, k) < 0:
+            return pd.NaT, np.nan
+        k = self.as_of_index[i, j, k]
+        if k < 0:
+            return pd.NaT, np.nan
+        return self.dates[k], self.values[i, j, k]
+
+    def get_snapshot(self, metric: str, date=None) -> pd.DataFrame:
+        """Getting the last value of a metric at or before a date for each ticker, e.g. for comparing the tickers in a bar chart.
+
+        Args:
+            metric (str): The metric.
+            date (str | pd.Timestamp, optional): The date. Defaults to None, which is the latest values.
+
+        Returns:
+            pd.DataFrame: A dataframe with the ticker, the date of the value and the value, which are NaT and nan for tickers without a value.
+        """
+        values = np.full(len(self.tickers), np.nan)
+        dates = np.full(len(self.tickers), np.datetime64("NaT"), dtype="datetime64[ns]")
+        j = self._metric_loc(metric)
+        k = self._as_of_loc(date)
+        # The cube is only indexed if the metric and date are in the panel.
+        if j >= 0 and k >= 0:
+            k = self.as_of_index[:, j, k]
+            found = np.flatnonzero(k >= 0)
+            values[found] = self.values[found, j, k[found]]
+            dates[found] = self.dates.to_numpy()[k[found]]
+        return pd.DataFrame(
+            data={
+                "ticker": self.tickers,
+                "date": dates,
+                "value": values,
+            }
+        )
+
+    def get_history(self, metric: str) -> pd.DataFrame:
+        """Getting the observed values of a metric for all tickers, e.g. for plotting the development of the tickers.
+
+        Args:
+            metric (str): The metric.
+
+        Returns:
+            pd.DataFrame: A dataframe with the ticker, date and value of each observation, ordered by ticker and date.
+        """
+        j = self._metric_loc(metric)
+        if j < 0:
+            i, k = np.array([], dtype=int), np.array([], dtype=int)
+            values = np.array([], dtype=np.float64)
+        else:
+            i, k = np.nonzero(~np.isnan(self.values[:, j, :]))
+            values = self.values[i, j, k]
+        return pd.DataFrame(
+            data={
+                "ticker": pd.Categorical.from_codes(i, categories=self.tickers),
+                "date": self.dates[k],
+                "value": values,
+            }
+        )
+
+    def get_latest_values(self, metric: str) -> pd.Series:
+        """Getting the latest value of a metric for each ticker.
+
+        Args:
+            metric (str): The metric.
+
+        Returns:
+            pd.Series: The latest value of each ticker, which is nan for tickers without the metric.
+        """
+        snapshot = self.get_snapshot(metric)
+        return pd.Series(snapshot["value"].to_numpy(), index=self.tickers, name=metric)
+
+    def get_metrics_with_coverage(self, min_tickers: float) -> list:
+        """Finding the metrics that at least min_tickers of the tickers have values for.
+
+        Args:
+            min_tickers (float): The minimum number of tickers.
+
+        Returns:
+            list: The metrics.
+        """
+        return self.coverage.index[self.coverage >= min_tickers].tolist()
+
+    def _as_of_loc(self, date=None) -> int:
+        # The index of the last date at or before the date (binary search), -1 if the date is before all dates.
+        if date is None:
+            return len(self.dates) - 1
+        return self.dates.searchsorted(pd.Timestamp(date), side="right") - 1
+
+    def _ticker_loc(self, ticker: str) -> int:
+        # The index of the ticker, -1 if it isn't in the panel.
+        return self.tickers.get_indexer([ticker])[0]
+
+    def _metric_loc(self, metric: str) -> int:
+        # The index of the metric, -1 if it isn't in the panel.
+        return self.metrics.get_indexer([metric])[0]
+
+
+def _categories(column: pd.Series) -> pd.Index:
+    # Keeping the order of categorical columns (e.g. the order of the tickers), otherwise the order of appearance.
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return pd.Index(column.cat.categories.astype(str))
+    return pd.Index(pd.unique(column.astype(str)))
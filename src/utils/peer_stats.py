@@ -0,0 +1,183 @@
+import warnings
+import numpy as np
+import pandas as pd
+from .panel import PeerPanel
+
+# The KPIs used in the valuation, which the market cap is divided by to get the financial.
+VALUATION_KPIS = ("quarterlyForwardPeRatio", "quarterlyPsRatio", "quarterlyPbRatio")
+
+
+def compute_peer_stats(
+    panel: PeerPanel, primary_ticker: str, percentiles: tuple = (25, 75)
+) -> pd.DataFrame:
+    """Computing where the primary ticker sits among its peers for every metric and date of the panel.
+    The statistics are computed across the ticker axis of the panel for all metrics and dates at once.
+    The peers are compared by their last value at or before each date (from the as-of index of the panel),
+    since tickers don't report on the same dates. The peer statistics exclude the primary ticker,
+    while the rank is among all tickers and is only given when there are peers to rank against.
+
+    Args:
+        panel (PeerPanel): The stats of the primary ticker and its peers.
+        primary_ticker (str): The primary ticker.
+        percentiles (tuple, optional): The percentiles of the peers to include besides the median, between 0 and 100. Defaults to (25, 75).
+
+    Returns:
+        pd.DataFrame: A table with one row per metric and date where the primary ticker or a peer has a value.
+            It has the number of peers with a value as of the date, the median, percentiles (p<percentile>), mean and std of the peers,
+            the value of the primary ticker, its z-score relative to the peers, its rank (1 is the highest value)
+            and the share of peers with a lower value.
+    """
+    values = panel.values
+    # The last value of each ticker at or before each date.
+    as_of_values = np.take_along_axis(values, np.maximum(panel.as_of_index, 0), axis=2)
+    as_of_values[panel.as_of_index < 0] = np.nan
+
+    i = panel.tickers.get_indexer([primary_ticker])[0]
+    if i < 0:
+        primary = np.full(values.shape[1:], np.nan)
+        peers = as_of_values
+    else:
+        primary = values[i]
+        peers = np.delete(as_of_values, i, axis=0)
+
+    observed = ~np.isnan(peers)
+    n_peers = observed.sum(axis=0)
+    with warnings.catch_warnings():
+        # Metrics and dates without any peer values give nan.
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        if peers.size:
+            quantiles = np.nanpercentile(peers, [50, *percentiles], axis=0)
+        else:
+            # nanpercentile doesn't keep the shape without any peers, metrics or dates.
+            quantiles = np.full((1 + len(percentiles), *values.shape[1:]), np.nan)
+        mean = np.nanmean(peers, axis=0)
+        std = np.nanstd(peers, axis=0, ddof=1)
+        z_score = np.where(std > 0, (primary - mean) / std, np.nan)
+        lower_share = (peers < primary).sum(axis=0) / n_peers
+
+    has_primary = ~np.isnan(primary)
+    has_rank = has_primary & (n_peers > 0)
+    rank = np.where(has_rank, 1 + (peers > primary).sum(axis=0), 0)
+
+    # The rows are the dates where the primary ticker or a peer reported the metric.
+    j, k = np.nonzero(~np.isnan(values).all(axis=0))
+    stats = {
+        "metric": pd.Categorical.from_codes(j, categories=panel.metrics),
+        "date": panel.dates[k],
+        "n_peers": n_peers[j, k].astype(np.int16),
+        "median": quantiles[0, j, k],
+    }
+    for percentile, quantile in zip(percentiles, quantiles[1:]):
+        stats[f"p{percentile:g}"] = quantile[j, k]
+    stats.update(
+        {
+            "mean": mean[j, k],
+            "std": std[j, k],
+            "value": primary[j, k],
+            "z_score": z_score[j, k],
+            "rank": pd.array(np.where(has_rank[j, k], rank[j, k], None), dtype="Int16"),
+            "lower_share": np.where(has_rank[j, k], lower_share[j, k], np.nan),
+        }
+    )
+    return pd.DataFrame(data=stats)
+
+
+def get_latest_peer_stats(stats: pd.DataFrame) -> pd.DataFrame:
+    """Getting the peer statistics of the latest date where the primary ticker has a value, for each metric.
+
+    Args:
+        stats (pd.DataFrame): The peer statistics from compute_peer_stats().
+
+    Returns:
+        pd.DataFrame: One row per metric.
+    """
+    stats = stats[stats["value"].notna()]
+    return stats.groupby("metric", observed=True).tail(1).reset_index(drop=True)
+
+
+def compute_valuation_priors(
+    panel: PeerPanel,
+    kpis: tuple = VALUATION_KPIS,
+    market_cap: str = "quarterlyMarketCap",
+    quantiles: tuple = (0.05, 0.5, 0.95),
+) -> dict:
+    """Estimating the distribution of each valuation KPI from the history of the tickers in the panel,
+    so the valuation can start from priors based on the peers instead of guessed standard deviations.
+    Only positive KPI values are used, since e.g. a negative PE doesn't say anything about the valuation.
+
+    Args:
+        panel (PeerPanel): The stats of the tickers, e.g. the primary ticker and its peers.
+        kpis (tuple, optional): The KPIs. Defaults to the forward PE, PS and PB ratios.
+        market_cap (str, optional): The market cap metric, used to find the financial of each KPI (market cap / KPI). Defaults to "quarterlyMarketCap".
+        quantiles (tuple, optional): The quantiles of the KPIs to include. Defaults to (0.05, 0.5, 0.95).
+
+    Returns:
+        dict: The mean, std, quantiles and number of observations of each KPI across all tickers and quarters,
+            and the yearly std of the log growth in the financial (e.g. the earnings for the PE).
+            The growth is found between the consecutive observations of each ticker, scaled by the time between them,
+            so tickers reporting on other dates than their peers don't affect each other.
+    """
+    kpi_values = _get_metric_values(panel, kpis)
+    kpi_values[kpi_values <= 0] = np.nan
+    pooled = kpi_values.transpose(1, 0, 2).reshape(len(kpis), -1)
+
+    # The financial behind each KPI and its growth between the observations of each ticker.
+    market_caps = _get_metric_values(panel, (market_cap,))
+    with warnings.catch_warnings():
+        # KPIs without any values give nan.
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        log_financials = np.log(market_caps / kpi_values)
+        growth = _get_yearly_growth(log_financials, panel.dates)
+        growth_std = np.nanstd(
+            growth.transpose(1, 0, 2).reshape(len(kpis), -1), axis=1, ddof=1
+        )
+
+        mean = np.nanmean(pooled, axis=1)
+        std = np.nanstd(pooled, axis=1, ddof=1)
+        if pooled.size:
+            kpi_quantiles = np.nanquantile(pooled, quantiles, axis=1)
+        else:
+            # nanquantile doesn't keep the shape without any tickers or dates.
+            kpi_quantiles = np.full((len(quantiles), len(kpis)), np.nan)
+    n = (~np.isnan(pooled)).sum(axis=1)
+
+    return {
+        kpi: {
+            "mean": mean[j],
+            "std": std[j],
+            "quantiles": dict(zip(quantiles, kpi_quantiles[:, j])),
+            "n": int(n[j]),
+            "financial_growth_std": growth_std[j],
+        }
+        for j, kpi in enumerate(kpis)
+    }
+
+
+def _get_metric_values(panel: PeerPanel, metrics: tuple) -> np.ndarray:
+    # The ticker*metric*date values of the metrics, which are nan for metrics that aren't in the panel.
+    j = panel.metrics.get_indexer(list(metrics))
+    values = np.full((len(panel.tickers), len(metrics), len(panel.dates)), np.nan)
+    values[:, j >= 0, :] = panel.values[:, j[j >= 0], :]
+    return values
+
+
+def _get_yearly_growth(log_values: np.ndarray, dates: pd.DatetimeIndex) -> np.ndarray:
+    # The growth of the ticker*metric*date log values since the previous observation of the same ticker and metric,
+    # divided by the square root of the years between them, so it has the variance of a yearly growth. It is nan without a previous observation.
+    if len(dates) == 0:
+        return np.full(log_values.shape, np.nan)
+    observed = np.isfinite(log_values)
+    last_index = np.maximum.accumulate(
+        np.where(observed, np.arange(len(dates)), -1), axis=2
+    )
+    previous_index = np.full(last_index.shape, -1)
+    previous_index[..., 1:] = last_index[..., :-1]
+    has_previous = observed & (previous_index >= 0)
+
+    previous_index = np.maximum(previous_index, 0)
+    previous_values = np.take_along_axis(log_values, previous_index, axis=2)
+    days = (dates - dates[0]).days.to_numpy()
+    years = (days - days[previous_index]) / 365.25
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (log_values - previous_values) / np.sqrt(years)
+    return np.where(has_previous, growth, np.nan)
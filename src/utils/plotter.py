@@ -2,8 +2,12 @@ import plotly.express as px
 import plotly.colors as pc
 import plotly.graph_objects as go
 from .styling import PrimaryColors, SecondaryColors, ColorList
+import numpy as np
 import pandas as pd
 
+# The units used to abbreviate large numbers, from the largest to the smallest.
+UNITS = ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K"))
+
 
 class Plotter:
     def __init__(self, data: pd.DataFrame, primary_ticker: str, peers: list) -> None:
@@ -55,6 +59,7 @@ class Plotter:
     def _convert_numbers(self, number_list: list) -> list:
         """Converting a list of numbers into a list of strings that are ready to be plotted.
         Converting large numbers to smaller numbers and adding the abbreviation for it.
+        All numbers are scaled by the same unit, which is found from the largest number.
 
         Args:
             number_list (list): A list of numbers
@@ -62,30 +67,16 @@ class Plotter:
         Returns:
             list: A list of strings with rounded numbers in the smallest possible format.
         """
-        try:
-            max_value = max(number_list)
-            if max_value / 1e12 > 1:
-                number_list = [
-                    str(round(val * 1.0 / 1e12, 1)) + "T" for val in number_list
-                ]
-            elif max_value / 1e9 > 1:
-                number_list = [
-                    str(round(val * 1.0 / 1e9, 1)) + "B" for val in number_list
-                ]
-            elif max_value / 1e6 > 1:
-                number_list = [
-                    str(round(val * 1.0 / 1e6, 1)) + "M" for val in number_list
-                ]
-            elif max_value / 1e3 > 1:
-                number_list = [
-                    str(round(val * 1.0 / 1e3, 1)) + "K" for val in number_list
-                ]
-            else:
-                number_list = [str(round(val * 1.0 / 1, 1)) for val in number_list]
-            return number_list
-        except:
-            number_list = [str(round(val * 1.0 / 1, 1)) for val in number_list]
-            return number_list
+        values = np.asarray(number_list, dtype=float)
+        finite = values[np.isfinite(values)]
+        max_value = finite.max() if finite.size > 0 else 0.0
+
+        scale, abbreviation = 1.0, ""
+        for unit_scale, unit_abbreviation in UNITS:
+            if max_value / unit_scale > 1:
+                scale, abbreviation = unit_scale, unit_abbreviation
+                break
+        return np.char.add(np.char.mod("%.1f", values / scale), abbreviation).tolist()
 
     def bar(self, y_col: str, mask: list, **kwargs):
         """Creating a bar plot using the plotly.express.bar function.
@@ -98,8 +89,8 @@ class Plotter:
         Returns:
             go.Figure: The bar plot.
         """
-        df = self.data.copy()
-        df = df[mask].sort_values(by=[y_col], ascending=[False])
+        # Boolean indexing creates a new (filtered) frame, so the full data isn't copied.
+        df = self.data[mask].sort_values(by=[y_col], ascending=[False])
 
         # Creating the color list
         tickers = df["ticker"].drop_duplicates().tolist()
@@ -124,22 +115,33 @@ class Plotter:
         )
         return fig
 
-    def line(self, y_col: str, **kwargs):
+    def line(self, y_col: str, mask: list = None, max_points: int = 5000, **kwargs):
         """Creating a line plot using the plotly.express.line function.
         The kwargs go into the line function.
+        When there are more than max_points points, each ticker is downsampled with LTTB (which keeps the shape of the lines)
+        and the lines are rendered with WebGL, so the plot stays interactive.
 
         Args:
             y_col (str): The y column that should be plotted from the dataframe inputted in the object.
+            mask (list, optional): A boolean list to filter the dataframe. Defaults to None, which plots all of it.
+            max_points (int, optional): The maximum number of points before the lines are downsampled. Defaults to 5000.
 
         Returns:
             go.Figure: The line plot.
         """
+        data = self.data if mask is None else self.data[mask]
+        render_mode = "auto"
+        if len(data) > max_points:
+            data = self._downsample(data, y_col, max_points)
+            render_mode = "webgl"
+
         fig = px.line(
-            self.data,
+            data,
             x="date",
             y=y_col,
             color="ticker",
             color_discrete_map=self.color_dict,
+            render_mode=render_mode,
             **kwargs,
         )
         fig.update_layout(
@@ -149,6 +151,67 @@ class Plotter:
         )
         return fig
 
+    def _downsample(
+        self, data: pd.DataFrame, y_col: str, max_points: int
+    ) -> pd.DataFrame:
+        """Downsampling the line of each ticker with LTTB, so there are at most max_points points in total.
+
+        Args:
+            data (pd.DataFrame): The data to downsample.
+            y_col (str): The y column.
+            max_points (int): The maximum number of points.
+
+        Returns:
+            pd.DataFrame: The downsampled data, ordered by ticker and date.
+        """
+        data = data.sort_values(by=["ticker", "date"])
+        groups = data.groupby("ticker", sort=False, observed=True).indices
+        n_points = max(max_points // max(len(groups), 1), 3)
+
+        x = data["date"].to_numpy()
+        if np.issubdtype(x.dtype, np.datetime64):
+            x = x.astype("int64")
+        x = x.astype(float)
+        y = data[y_col].to_numpy(dtype=float)
+
+        positions = [rows[lttb(x[rows], y[rows], n_points)] for rows in groups.values()]
+        return data.iloc[np.sort(np.concatenate(positions))] if positions else data
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Finding the points to keep when downsampling a line with the Largest Triangle Three Buckets algorithm.
+    The first and last points are kept, and the points in between are split into n_out - 2 buckets.
+    From each bucket the point forming the largest triangle with the previously kept point and
+    the average of the next bucket is kept, so peaks and troughs survive the downsampling.
+
+    Args:
+        x (np.ndarray): The sorted x values.
+        y (np.ndarray): The y values.
+        n_out (int): The number of points to keep.
+
+    Returns:
+        np.ndarray: The indices of the kept points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + np.argmax(area)
+        keep[i + 1] = a
+    return keep
+
 
 if __name__ == "__main__":
     df = pd.DataFrame(
@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson as json_backend  # A faster json parser, which is used if it is installed.
+except ImportError:
+    json_backend = json
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        """A token bucket rate limiter, allowing bursts of up to capacity requests and rate requests per second on average.
+        It is thread safe, so it can be shared by concurrent requests.
+
+        Args:
+            rate (float): The number of tokens added per second.
+            capacity (float): The maximum number of tokens in the bucket.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Taking a token from the bucket, waiting until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class YahooSession:
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        rate: float = 5.0,
+        burst: int = 5,
+        pool_size: int = 10,
+    ) -> None:
+        """A HTTP session shared by the requests to yahoo finance.
+        The connections are kept alive in a pool, failed requests (including 429 Too Many Requests) are retried
+        with exponential backoff and the number of requests per second is limited by a token bucket.
+
+        Args:
+            timeout (float, optional): The number of seconds to wait for the server. Defaults to 10.0.
+            retries (int, optional): The maximum number of retries of a request. Defaults to 3.
+            backoff_factor (float, optional): The retries wait backoff_factor * 2 ** (retry - 1) seconds,
+                unless the server asks for something else with a Retry-After header. Defaults to 0.5.
+            rate (float, optional): The average number of requests per second. Defaults to 5.0.
+            burst (int, optional): The number of requests that can be sent at once. Defaults to 5.
+            pool_size (int, optional): The number of connections kept alive per host. Defaults to 10.
+        """
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(rate, burst)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = "Mozilla/5.0"
+
+    def get_json(self, url: str, params: dict = None) -> dict:
+        """Requesting the url and reading the json response.
+
+        Args:
+            url (str): The url.
+            params (dict, optional): The query parameters. Defaults to None.
+
+        Returns:
+            dict: The json response.
+        """
+        self.rate_limiter.acquire()
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return json_backend.loads(response.content)
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_default_session() -> YahooSession:
+    """Getting the session shared by all extractors that aren't given one.
+
+    Returns:
+        YahooSession: The shared session.
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = YahooSession()
+        return _default_session
@@ -1,37 +1,116 @@
+import math
 import numpy as np
 
+# Nodes and weights for Gauss-Hermite quadrature of the expectation of a function of a normal variable.
+QUADRATURE_NODES, QUADRATURE_WEIGHTS = np.polynomial.hermite_e.hermegauss(100)
+QUADRATURE_WEIGHTS = QUADRATURE_WEIGHTS / math.sqrt(2 * math.pi)
+
 class MonteCarloSimulation:
-    def __init__(self, kpi_current: float, kpi_estimated: float, kpi_std: float, financial_current: float, financial_estimated: float, financial_std: float) -> None:
+    def __init__(self, kpi_current: float, kpi_estimated: float, kpi_std: float, financial_current: float, financial_estimated: float, financial_std: float, n_simulations: int = 100000, seed: int | np.random.Generator = None, dtype: np.dtype = np.float64) -> None:
+        """Simulating a future valuation as the product of an estimated KPI (e.g. PE) and an estimated financial (e.g. earnings).
+        Each distribution is only sampled once and then reused, so the valuation and the CAGR are based on the same samples.
+
+        Args:
+            n_simulations (int, optional): The number of samples of each distribution. Defaults to 100000.
+            seed (int | np.random.Generator, optional): The seed of the random number generator, or a generator to draw from. Defaults to None.
+            dtype (np.dtype, optional): The float type of the simulations, np.float32 halves the memory. Defaults to np.float64.
+        """
         self.kpi_current = kpi_current
         self.kpi_estimated = kpi_estimated
         self.kpi_std = kpi_std
         self.financial_current = financial_current
         self.financial_estimated = financial_estimated
         self.financial_std = financial_std
-        self.n_simulations = 100000
+        self.n_simulations = n_simulations
+        self.rng = np.random.default_rng(seed)
+        self.dtype = np.dtype(dtype)
+        self.distributions = {}
 
     def get_kpi_distribution(self) -> np.ndarray:
-        dist_estimated = np.random.normal(self.kpi_estimated, self.kpi_std, size = self.n_simulations)
-        return dist_estimated
+        if not "kpi" in self.distributions.keys():
+            self.distributions["kpi"] = self._normal(self.kpi_estimated, self.kpi_std)
+        return self.distributions["kpi"]
 
     def get_financial_distribution(self) -> np.ndarray:
-        dist_estimated = np.random.normal(self.financial_estimated, self.financial_std, size = self.n_simulations)
-        return dist_estimated
+        if not "financial" in self.distributions.keys():
+            self.distributions["financial"] = self._normal(self.financial_estimated, self.financial_std)
+        return self.distributions["financial"]
 
     def get_valuation_distribution(self) -> np.ndarray:
-        dist_valuation = self.get_kpi_distribution() * self.get_financial_distribution()
-        return dist_valuation
-    
+        if not "valuation" in self.distributions.keys():
+            self.distributions["valuation"] = self.get_kpi_distribution() * self.get_financial_distribution()
+        return self.distributions["valuation"]
+
     def get_valuation_cagr_distribution(self, periods: float) -> np.ndarray:
         valuation_current = self.kpi_current * self.financial_current
         estimated_valuation = self.get_valuation_distribution()
-        if min(estimated_valuation)<0:
+        if estimated_valuation.min()<0:
             print("It is not possible to calculate a cagr to a negative ending value")
             return None
         else:
             cagr = (estimated_valuation / valuation_current)**(1/periods) - 1
             return cagr
-        
+
+    def get_valuation_mean(self) -> float:
+        """The mean of the valuation, which is the product of the means as the KPI and the financial are independent."""
+        return self.kpi_estimated * self.financial_estimated
+
+    def get_valuation_std(self) -> float:
+        """The standard deviation of the valuation, calculated from the variance of a product of independent normals."""
+        variance = (
+            self.kpi_estimated**2 * self.financial_std**2
+            + self.financial_estimated**2 * self.kpi_std**2
+            + self.kpi_std**2 * self.financial_std**2
+        )
+        return math.sqrt(variance)
+
+    def get_cagr_probability(self, periods: float, wanted_cagr: float) -> float:
+        """Calculating the probability of getting a CAGR above the wanted CAGR without sampling.
+        This is the probability of the valuation being above the current valuation grown by the wanted CAGR.
+        The probability is found by conditioning on one of the normals (numerical quadrature) and using the normal cdf of the other.
+
+        Args:
+            periods (float): The number of periods until the estimates.
+            wanted_cagr (float): The wanted CAGR, e.g. 0.1 for 10 %.
+
+        Returns:
+            float: The probability of getting a CAGR above the wanted CAGR.
+        """
+        valuation_current = self.kpi_current * self.financial_current
+        if valuation_current <= 0:
+            print("It is not possible to calculate a cagr from a current value that isn't positive")
+            return np.nan
+        threshold = valuation_current * (1 + wanted_cagr)**periods
+
+        # Conditioning on the normal with the smallest relative spread gives the smoothest integrand.
+        conditioned = (self.kpi_estimated, self.kpi_std)
+        other = (self.financial_estimated, self.financial_std)
+        if abs(self.kpi_std * self.financial_estimated) > abs(self.financial_std * self.kpi_estimated):
+            conditioned, other = other, conditioned
+
+        values = conditioned[0] + conditioned[1] * QUADRATURE_NODES
+        probabilities = np.empty(len(values))
+        positive, negative = values > 0, values < 0
+        # The product is above the threshold when the other normal is above (or below, for negative values) threshold / value.
+        probabilities[positive] = 1 - _normal_cdf(threshold / values[positive], *other)
+        probabilities[negative] = _normal_cdf(threshold / values[negative], *other)
+        probabilities[values == 0] = 0.0
+        return float(np.sum(QUADRATURE_WEIGHTS * probabilities))
+
+    def _normal(self, mean: float, std: float) -> np.ndarray:
+        # Filling a preallocated array with standard normal draws and scaling it in place.
+        dist = np.empty(self.n_simulations, dtype=self.dtype)
+        self.rng.standard_normal(dtype=self.dtype, out=dist)
+        dist *= std
+        dist += mean
+        return dist
+
+def _normal_cdf(x: np.ndarray, mean: float, std: float) -> np.ndarray:
+    # The cdf of a normal distribution, where a standard deviation of 0 gives a step function.
+    if std == 0:
+        return (x >= mean).astype(float)
+    return np.array([0.5 * math.erfc((mean - value) / (std * math.sqrt(2))) for value in x])
+
 if __name__ == "__main__":
     d = {
         "kpi_current": 15,
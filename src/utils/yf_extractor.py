@@ -1,59 +1,120 @@
-from bs4 import BeautifulSoup
-import urllib.request as ur
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+import numpy as np
 import pandas as pd
+from .cache import FundamentalsCache
+from .session import YahooSession, get_default_session
+
+TIMESERIES_URL = (
+    "https://query2.finance.yahoo.com/ws/fundamentals-timeseries/v1/finance/timeseries/"
+)
+RECOMMENDATIONS_URL = (
+    "https://query1.finance.yahoo.com/v6/finance/recommendationsbysymbol/"
+)
+
+# The registry of metrics that can be extracted from the fundamentals timeseries, with a readable name of each.
+METRICS = {
+    "quarterlyMarketCap": "Market Cap (Quarterly)",
+    "trailingMarketCap": "Market Cap (Trailing)",
+    "quarterlyEnterpriseValue": "Enterprise Value (Quarterly)",
+    "trailingEnterpriseValue": "Enterprise Value (Trailing)",
+    "quarterlyPeRatio": "Price Earnings (Quarterly)",
+    "trailingPeRatio": "Price Earnings (Trailing)",
+    "quarterlyForwardPeRatio": "Price Earnings Forward (Quarterly)",
+    "trailingForwardPeRatio": "Price Earnings Forward (Trailing)",
+    "quarterlyPegRatio": "PEG (Quarterly)",
+    "trailingPegRatio": "PEG (Trailing)",
+    "quarterlyPsRatio": "Price Sales (Quarterly)",
+    "trailingPsRatio": "Price Sales (Trailing)",
+    "quarterlyPbRatio": "Price Book (Quarterly)",
+    "trailingPbRatio": "Price Book (Trailing)",
+    "quarterlyEnterprisesValueRevenueRatio": "EV / Revenue (Quarterly)",
+    "trailingEnterprisesValueRevenueRatio": "EV / Revenue (Trailing)",
+    "quarterlyEnterprisesValueEBITDARatio": "EV / EBITDA (Quarterly)",
+    "trailingEnterprisesValueEBITDARatio": "EV / EBITDA (Trailing)",
+}
+# The metrics used by the valuation page.
+VALUATION_METRICS = [
+    "quarterlyMarketCap",
+    "quarterlyForwardPeRatio",
+    "quarterlyPbRatio",
+    "quarterlyPsRatio",
+]
+# The start of the history (unix timestamp) that is extracted, the end is always the current time.
+PERIOD1 = 493590046
 
 
 class YahooExtractor:
-    def __init__(self, ticker: str):
+    def __init__(
+        self,
+        ticker: str,
+        cache: FundamentalsCache = None,
+        session: YahooSession = None,
+    ):
+        """Extracting data about a ticker from yahoo finance.
+
+        Args:
+            ticker (str): The ticker.
+            cache (FundamentalsCache, optional): A local cache of the stats, so they are only fetched when they aren't cached. Defaults to None.
+            session (YahooSession, optional): The session used for the requests. Defaults to the session shared by all extractors.
+        """
         self.ticker = ticker
+        self.cache = cache
+        self.session = session if session is not None else get_default_session()
 
-    def get_stats(self) -> pd.DataFrame:
+    def get_stats(self, metrics: list = None) -> pd.DataFrame:
         """Extracting the stats for the selected ticker from yahoo finance.
 
+        Args:
+            metrics (list, optional): The metrics to extract, which must be in METRICS. Defaults to all of METRICS.
+
         Returns:
-            pd.DataFrame: A dataframe containing the stats of the ticker.
+            pd.DataFrame: A dataframe containing the stats of the ticker with a categorical metric and ticker,
+                a datetime date and a float value.
         """
-        url = f"https://query2.finance.yahoo.com/ws/fundamentals-timeseries/v1/finance/timeseries/{self.ticker}?lang=en-US&region=US&symbol={self.ticker}&padTimeSeries=true&type=quarterlyMarketCap%2CtrailingMarketCap%2CquarterlyEnterpriseValue%2CtrailingEnterpriseValue%2CquarterlyPeRatio%2CtrailingPeRatio%2CquarterlyForwardPeRatio%2CtrailingForwardPeRatio%2CquarterlyPegRatio%2CtrailingPegRatio%2CquarterlyPsRatio%2CtrailingPsRatio%2CquarterlyPbRatio%2CtrailingPbRatio%2CquarterlyEnterprisesValueRevenueRatio%2CtrailingEnterprisesValueRevenueRatio%2CquarterlyEnterprisesValueEBITDARatio%2CtrailingEnterprisesValueEBITDARatio&merge=false&period1=493590046&period2=1690014975&corsDomain=finance.yahoo.com"
-
-        stat_dict = self._get_readable_json(url)
-
-        # Starting to input data into the dataframe.
-        df = pd.DataFrame(columns=["metric", "date", "value"])
+        return _create_stats_df({self.ticker: self._get_stat_columns(metrics)})
 
-        for i in range(len(stat_dict["timeseries"]["result"])):
-            # Looping through each metric and putting it into dataframe if possible.
-            stats = stat_dict["timeseries"]["result"][i]
-
-            metric = stats["meta"]["type"][0]
+    @staticmethod
+    def get_stats_many(
+        tickers: list,
+        max_workers: int = 8,
+        callback=None,
+        cache: FundamentalsCache = None,
+        session: YahooSession = None,
+        metrics: list = None,
+    ) -> pd.DataFrame:
+        """Extracting the stats for multiple tickers concurrently, with at most max_workers requests at a time.
 
-            try:
-                stat_vals = stats[metric]
+        Args:
+            tickers (list): The tickers to extract the stats for.
+            max_workers (int, optional): The maximum number of concurrent requests. Defaults to 8.
+            callback (callable, optional): Called with the number of finished tickers, the total number of tickers
+                and the ticker that just finished, e.g. to update a progress bar. It is called from the calling thread. Defaults to None.
+            cache (FundamentalsCache, optional): A local cache of the stats shared by all tickers. Defaults to None.
+            session (YahooSession, optional): The session used for the requests. Defaults to the session shared by all extractors.
+            metrics (list, optional): The metrics to extract, which must be in METRICS. Defaults to all of METRICS.
 
-                stat_dates = []
-                stat_values = []
-                for stat_val in stat_vals:
-                    stat_date = stat_val["asOfDate"]
-                    stat_value = stat_val["reportedValue"]["raw"]
-
-                    stat_dates.append(stat_date)
-                    stat_values.append(stat_value)
-
-                stat_metrics = [metric] * len(stat_values)
-                sub_df = pd.DataFrame(
-                    data={
-                        "metric": stat_metrics,
-                        "date": stat_dates,
-                        "value": stat_values,
-                    }
-                )
-
-                df = pd.concat([df, sub_df], ignore_index=True)
-            except:
-                # If it isn't possible to extract the data then continue to the next metric.
-                continue
+        Returns:
+            pd.DataFrame: A dataframe containing the stats of all tickers like get_stats(), in the order of the tickers.
+        """
+        tickers = list(dict.fromkeys(tickers))  # Each ticker is only extracted once.
+        metrics = _validate_metrics(metrics)
+        ticker_columns = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    YahooExtractor(ticker, cache, session)._get_stat_columns, metrics
+                ): ticker
+                for ticker in tickers
+            }
+            for i, future in enumerate(as_completed(futures)):
+                ticker = futures[future]
+                ticker_columns[ticker] = future.result()
+                if callback is not None:
+                    callback(i + 1, len(futures), ticker)
 
-        return df
+        return _create_stats_df({ticker: ticker_columns[ticker] for ticker in tickers})
 
     def get_potential_metrics(self) -> list:
         """Creating a list of metrics that are included the dataframe.
@@ -70,10 +131,8 @@ class YahooExtractor:
         Returns:
             list: The list of recommended tickers.
         """
-        url = f"https://query1.finance.yahoo.com/v6/finance/recommendationsbysymbol/{self.ticker}?"
-
         try:
-            symbol_json = self._get_readable_json(url)
+            symbol_json = self.session.get_json(RECOMMENDATIONS_URL + self.ticker)
             s = symbol_json["finance"]["result"][0]["recommendedSymbols"]
             symbols = [val["symbol"] for val in s]
 
@@ -82,23 +141,136 @@ class YahooExtractor:
             print("Didn't find any recommended symbols")
             return None
 
-    def _get_readable_json(self, url) -> dict:
-        """Converting the url into a more readable format that can then be structured for some valid output.
+    def _get_stat_columns(self, metrics: list = None) -> dict:
+        """Extracting the stats for the selected ticker as columns from yahoo finance.
+        With a cache only the metrics that aren't cached are fetched, from where their cached observations end,
+        and merged into the cache. Nothing is fetched if the metrics have been refreshed within the TTL of the cache,
+        and the cached observations are used if the metrics are cached but the refresh fails.
 
         Args:
-            url (str): The url which should be converted into a more readable format.
+            metrics (list, optional): The metrics to extract, which must be in METRICS. Defaults to all of METRICS.
 
         Returns:
-            dict: The url in a more readable format.
+            dict: A dictionary with a list of metrics, dates and values.
         """
-        read_data = ur.urlopen(url).read()
-        soup_stat = BeautifulSoup(read_data, "lxml")
-        output_string = str(soup_stat.find_all("p")[0])[
-            3:-4
-        ]  # Trimming the html string to a json convertible string
-        output_json = json.loads(output_string)
-
-        return output_json
+        metrics = _validate_metrics(metrics)
+        period1, period2 = PERIOD1, int(time.time())
+        fetched_metrics = metrics
+        if self.cache is not None:
+            # The cache is shared by the threads (and sessions), so the missing metrics are only looked up once.
+            fetched_metrics = self.cache.get_missing_metrics(
+                self.ticker, metrics, period1, period2
+            )
+            if not fetched_metrics:
+                return self.cache.read(self.ticker, metrics, period1, period2)
+            # Only fetching the missing metrics, from where their cached observations end.
+            period1 = self.cache.get_refresh_period1(
+                self.ticker, fetched_metrics, PERIOD1
+            )
+
+        try:
+            stat_dict = self.session.get_json(
+                TIMESERIES_URL + self.ticker,
+                params={
+                    "lang": "en-US",
+                    "region": "US",
+                    "symbol": self.ticker,
+                    "padTimeSeries": "true",
+                    "type": ",".join(fetched_metrics),
+                    "merge": "false",
+                    "period1": period1,
+                    "period2": period2,
+                    "corsDomain": "finance.yahoo.com",
+                },
+            )
+        except (OSError, ValueError):
+            # The request failed (e.g. offline), so the cached series are used even if they aren't fresh.
+            # Metrics that have never been fetched are refreshed from PERIOD1, and can't be used.
+            if self.cache is None or period1 == PERIOD1:
+                raise
+            print(
+                f"Couldn't refresh the stats of {self.ticker}, using the cached stats instead"
+            )
+            return self.cache.read(self.ticker, metrics, PERIOD1, period2)
+
+        # Collecting the observations of all metrics in flat lists.
+        columns = {"metric": [], "date": [], "value": []}
+
+        for stats in stat_dict["timeseries"]["result"]:
+            # Looping through each metric and adding it to the columns if possible.
+            metric = stats["meta"]["type"][0]
+            if not metric in fetched_metrics:
+                continue
+
+            try:
+                stat_vals = stats[metric]
+                stat_dates = [stat_val["asOfDate"] for stat_val in stat_vals]
+                stat_values = [
+                    stat_val["reportedValue"]["raw"] for stat_val in stat_vals
+                ]
+            except:
+                # If it isn't possible to extract the data then continue to the next metric.
+                continue
+
+            columns["metric"].extend([metric] * len(stat_values))
+            columns["date"].extend(stat_dates)
+            columns["value"].extend(stat_values)
+
+        if self.cache is not None:
+            self.cache.merge(self.ticker, fetched_metrics, period1, period2, columns)
+            columns = self.cache.read(self.ticker, metrics, PERIOD1, period2)
+        return columns
+
+
+def _validate_metrics(metrics: list = None) -> list:
+    """Checking that the metrics are in the registry of metrics.
+
+    Args:
+        metrics (list, optional): The metrics. Defaults to all of METRICS.
+
+    Returns:
+        list: The metrics without duplicates.
+    """
+    if metrics is None:
+        return list(METRICS.keys())
+    unknown = [metric for metric in metrics if not metric in METRICS.keys()]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+    return list(dict.fromkeys(metrics))
+
+
+def _create_stats_df(ticker_columns: dict) -> pd.DataFrame:
+    """Creating one dataframe with typed columns from the stat columns of each ticker.
+
+    Args:
+        ticker_columns (dict): The stat columns (metric, date and value lists) of each ticker.
+
+    Returns:
+        pd.DataFrame: A dataframe with a categorical metric, a datetime date, a float value and a categorical ticker.
+    """
+    tickers = list(ticker_columns.keys())
+    columns = list(ticker_columns.values())
+    lengths = [len(column["value"]) for column in columns]
+
+    return pd.DataFrame(
+        data={
+            "metric": pd.Categorical(
+                list(chain.from_iterable(column["metric"] for column in columns))
+            ),
+            "date": pd.to_datetime(
+                list(chain.from_iterable(column["date"] for column in columns)),
+                format="%Y-%m-%d",
+            ),
+            "value": np.fromiter(
+                chain.from_iterable(column["value"] for column in columns),
+                dtype=np.float64,
+                count=sum(lengths),
+            ),
+            "ticker": pd.Categorical.from_codes(
+                np.repeat(np.arange(len(tickers)), lengths), categories=tickers
+            ),
+        }
+    )
 
 
 if __name__ == "__main__":
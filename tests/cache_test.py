@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.cache import FundamentalsCache
+
+
+def create_stats(metric, values):
+    return {
+        "metric": [metric] * len(values),
+        "date": ["2023-03-31", "2023-06-30"][: len(values)],
+        "value": values,
+    }
+
+
+class TestFundamentalsCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+        self.cache = FundamentalsCache(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_counters_are_thread_safe(self):
+        metrics = ["quarterlyPeRatio"]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(
+                executor.map(
+                    lambda _: self.cache.get("AAPL", metrics, 0, 1700000000),
+                    range(400),
+                )
+            )
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 400))
+
+    def test_hit_and_miss(self):
+        metrics = ["quarterlyPeRatio", "quarterlyPbRatio"]
+        self.assertIsNone(self.cache.get("AAPL", metrics, 0, 1700000000))
+        stats = create_stats("quarterlyPbRatio", [3.0, 4.0])
+        for column, values in create_stats("quarterlyPeRatio", [25.0]).items():
+            stats[column] += values
+        self.cache.merge("AAPL", metrics, 0, 1700000000, stats)
+
+        # The cache is persisted, so a new cache on the same file has the stats.
+        cache = FundamentalsCache(self.path)
+        columns = cache.get("AAPL", metrics, 0, 1700000000)
+        self.assertEqual(columns["metric"], [metrics[0]] + [metrics[1]] * 2)
+        self.assertEqual(columns["value"], [25.0, 3.0, 4.0])
+        self.assertIsNone(cache.get("AAPL", metrics + ["quarterlyPsRatio"], 0, 1))
+        self.assertIsNone(cache.get("AAPL", metrics, -1, 1700000000))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_empty_metric_is_cached(self):
+        self.cache.merge("AAPL", ["quarterlyPegRatio"], 0, 1, create_stats("x", []))
+        self.assertEqual(
+            self.cache.get("AAPL", ["quarterlyPegRatio"], 0, 1)["value"], []
+        )
+
+    def test_ttl(self):
+        self.cache.merge("AAPL", ["quarterlyPeRatio"], 0, 1, create_stats("x", []))
+        # Within the TTL the series covers requests up to now, afterwards only the fetched range.
+        self.assertIsNotNone(self.cache.get("AAPL", ["quarterlyPeRatio"], 0, 2))
+        self.cache.ttl = -1
+        self.assertIsNotNone(self.cache.get("AAPL", ["quarterlyPeRatio"], 0, 1))
+        self.assertIsNone(self.cache.get("AAPL", ["quarterlyPeRatio"], 0, 2))
+
+    def test_incremental_merge(self):
+        metrics = ["quarterlyPeRatio", "quarterlyPegRatio"]
+        self.assertEqual(self.cache.get_refresh_period1("AAPL", metrics, 0), 0)
+        self.cache.merge(
+            "AAPL", metrics, 0, 1690000000, create_stats("quarterlyPeRatio", [1.0, 2.0])
+        )
+        # Starting from the last observation, 2023-06-30.
+        self.assertEqual(self.cache.get_refresh_period1("AAPL", metrics, 0), 1688083200)
+        self.cache.merge(
+            "AAPL",
+            metrics,
+            1688083200,
+            1700000000,
+            {
+                "metric": ["quarterlyPeRatio"] * 2,
+                "date": ["2023-06-30", "2023-09-30"],
+                "value": [2.5, 3.0],
+            },
+        )
+        columns = self.cache.get("AAPL", metrics, 0, 1700000000)
+        self.assertEqual(columns["date"], ["2023-03-31", "2023-06-30", "2023-09-30"])
+        self.assertEqual(columns["value"], [1.0, 2.5, 3.0])
+        # A metric without observations is refreshed from the end of its cached range.
+        self.assertEqual(
+            self.cache.get_refresh_period1("AAPL", ["quarterlyPegRatio"], 0),
+            1700000000,
+        )
+        # Without any metrics there isn't anything cached to start from.
+        self.assertEqual(self.cache.get_refresh_period1("AAPL", [], 5), 5)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.max_rows = 4
+        for ticker in ["A", "B"]:
+            self.cache.merge(
+                ticker,
+                ["quarterlyPeRatio"],
+                0,
+                1,
+                create_stats("quarterlyPeRatio", [1.0, 2.0]),
+            )
+        self.cache.get("A", ["quarterlyPeRatio"], 0, 1)
+        self.cache.merge(
+            "C", ["quarterlyPeRatio"], 0, 1, create_stats("quarterlyPeRatio", [1.0])
+        )
+        self.assertIsNotNone(self.cache.get("A", ["quarterlyPeRatio"], 0, 1))
+        self.assertIsNone(self.cache.get("B", ["quarterlyPeRatio"], 0, 1))
+        self.assertIsNotNone(self.cache.get("C", ["quarterlyPeRatio"], 0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
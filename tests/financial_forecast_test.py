@@ -1,5 +1,10 @@
 import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
 from src.financial_forecast.simulation import cagr, FinancialForecast
+from src.financial_forecast.accumulators import OnlineMoments, StreamingHistogram
+from src.financial_forecast.batch import batch_fair_value_summary
 
 
 class TestGrowthMethods(unittest.TestCase):
@@ -38,6 +43,334 @@ class TestForecast(unittest.TestCase):
         gm = ff.get_gross_margin()
         self.assertAlmostEqual(gm.shape, (ff.n_samples, ff.n_periods))
 
+    def test_scenario_blocks(self):
+        current = {"revenue": 10}
+        scenario_1 = {"revenue": 40, "revenue_uncertainty": 0, "probability": 0.3}
+        scenario_2 = {"revenue": 90, "revenue_uncertainty": 0, "probability": 0.7}
+        ff = FinancialForecast(
+            current=current,
+            estimates=[scenario_1, scenario_2],
+            n_samples=10,
+            n_periods=2,
+        )
+        rev = ff.get_revenue()
+        self.assertEqual(rev.shape, (10, 2))
+        self.assertTrue(np.allclose(rev[:3], [20, 40]))
+        self.assertTrue(np.allclose(rev[3:], [30, 90]))
+
+    def test_scenario_lookup(self):
+        estimates = [
+            {"scenario_name": "bear", "probability": 0.25},
+            {"scenario_name": "bull", "probability": 0.75},
+        ]
+        ff = FinancialForecast(
+            current={}, estimates=estimates, n_samples=8, n_periods=2
+        )
+        self.assertEqual(ff.get_scenario_slice("bull"), slice(2, 8))
+        self.assertEqual(ff.get_scenario_index().tolist(), [0, 0, 1, 1, 1, 1, 1, 1])
+
+
+class TestLineItemGraph(unittest.TestCase):
+    def setUp(self):
+        current = {
+            "revenue": 100,
+            "ebit_margin": 0.1,
+            "interest_expense": 5,
+            "deprication_amortization": 10,
+            "net_working_capital": 2,
+        }
+        estimate = {
+            "revenue": 150,
+            "revenue_uncertainty": 10,
+            "ebit_margin": 0.15,
+            "ebit_margin_uncertainty": 0.01,
+            "interest_expense": 5,
+            "interest_expense_uncertainty": 0.5,
+            "deprication_amortization": 10,
+            "deprication_amortization_uncertainty": 1,
+            "net_working_capital": 2,
+            "net_working_capital_uncertainty": 0.2,
+            "probability": 1.0,
+            "shares": 10,
+        }
+        self.ff = FinancialForecast(
+            current=current,
+            estimates=estimate,
+            n_samples=100,
+            n_periods=5,
+            wacc=0.08,
+            perpetual_rate=0.02,
+            tax_rate=0.22,
+        )
+
+    def test_repeated_calls_are_cached(self):
+        self.assertIs(self.ff.get_revenue(), self.ff.get_revenue())
+
+    def test_new_inputs_resample(self):
+        fair_value = self.ff.get_fair_value_per_share()
+        self.ff.current = {**self.ff.current, "revenue": 120}
+        self.assertIsNot(self.ff.get_fair_value_per_share(), fair_value)
+
+        estimate = {**self.ff.estimates[0], "probability": 0.5}
+        self.ff.estimates = estimate
+        self.assertEqual(self.ff.n_samples, 50)
+        self.assertEqual(self.ff.get_fair_value_per_share().shape, (50,))
+
+    def test_new_wacc_does_not_resample(self):
+        revenue = self.ff.get_revenue()
+        value = self.ff.get_discounted_company_value()
+        self.ff.wacc = 0.1
+        new_value = self.ff.get_discounted_company_value()
+        self.assertIs(self.ff.get_revenue(), revenue)
+        self.assertTrue(np.all(new_value < value))
+
+    def test_new_tax_rate_recalculates_net_income(self):
+        net_income = self.ff.get_net_income()
+        fcf = self.ff.get_free_cashflow()
+        self.ff.tax_rate = 0.5
+        self.assertIsNot(self.ff.get_net_income(), net_income)
+        self.assertIsNot(self.ff.get_free_cashflow(), fcf)
+
+    def test_sensitivity_matches_company_value(self):
+        wacc = np.array([0.07, 0.09])
+        perpetual_rate = np.array([0.01, 0.02, 0.03])
+        grid = self.ff.get_company_value_sensitivity(wacc, perpetual_rate)
+        summary = self.ff.get_company_value_sensitivity(
+            wacc, perpetual_rate, summary=True
+        )
+        self.assertEqual(grid.shape, (2, 3, self.ff.n_samples))
+        for i, w in enumerate(wacc):
+            for j, g in enumerate(perpetual_rate):
+                self.ff.wacc, self.ff.perpetual_rate = w, g
+                value = self.ff.get_discounted_company_value()
+                self.assertTrue(np.allclose(grid[i, j], value))
+                self.assertAlmostEqual(summary["mean"][i, j], value.mean())
+                self.assertAlmostEqual(summary["std"][i, j], value.std())
+                self.assertAlmostEqual(summary["quantiles"][1, i, j], np.median(value))
+
+    def test_streaming_summary(self):
+        chunks = list(self.ff.iter_fair_value_per_share(chunk_size=30))
+        self.assertEqual([len(chunk) for chunk in chunks], [30, 30, 30, 10])
+        summary = self.ff.get_streaming_summary(chunk_size=30, n_bins=100)
+        self.assertEqual(summary["histogram"].count, self.ff.n_samples)
+        self.assertEqual(summary["dropped"], 0)
+        self.assertGreater(summary["std"], 0)
+
+    def test_streaming_summary_drops_nan(self):
+        chunks = [np.array([1.0, np.nan, 3.0]), np.array([np.inf, 5.0])]
+        with mock.patch.object(
+            FinancialForecast, "iter_fair_value_per_share", return_value=iter(chunks)
+        ):
+            summary = self.ff.get_streaming_summary()
+        self.assertEqual(summary["dropped"], 2)
+        self.assertEqual(summary["histogram"].count, 3)
+        self.assertAlmostEqual(summary["mean"], 3.0)
+
+    def test_parallel_is_reproducible(self):
+        self.ff.seed = 42
+        first = self.ff.get_fair_value_per_share_parallel(n_workers=2)
+        second = self.ff.get_fair_value_per_share_parallel(n_workers=2)
+        self.assertEqual(first.shape, (self.ff.n_samples,))
+        self.assertTrue(np.array_equal(first, second))
+
+    def test_seed_is_reproducible(self):
+        ff = FinancialForecast(
+            current=self.ff.current,
+            estimates=self.ff.estimates,
+            n_samples=100,
+            n_periods=5,
+            seed=1,
+        )
+        self.ff.rng = np.random.default_rng(1)
+        self.assertTrue(np.array_equal(ff.get_revenue(), self.ff.get_revenue()))
+
+    def test_resample(self):
+        revenue = self.ff.get_revenue()
+        self.ff.resample()
+        self.assertFalse(np.array_equal(self.ff.get_revenue(), revenue))
+
+
+class TestBatch(unittest.TestCase):
+    def test_batch_matches_forecast(self):
+        drivers = {
+            "revenue": 100,
+            "ebit_margin": 0.1,
+            "interest_expense": 5,
+            "deprication_amortization": 10,
+            "net_working_capital": 2,
+        }
+        estimates = []
+        for probability, revenue, shares in [(0.6, 150, 10), (0.4, 200, 20)]:
+            estimate = {driver + "_uncertainty": 0 for driver in drivers}
+            estimate.update(
+                drivers, revenue=revenue, probability=probability, shares=shares
+            )
+            estimates.append(estimate)
+        parameters = dict(n_periods=5, wacc=0.08, perpetual_rate=0.02, tax_rate=0.22)
+
+        # The second company has twice the current revenue and only the first scenario.
+        current = {
+            driver: np.array([value, value]) for driver, value in drivers.items()
+        }
+        current["revenue"] = np.array([100, 200])
+        batch_estimates = [
+            {**estimates[0], "probability": np.array([0.6, 1.0])},
+            {**estimates[1], "probability": np.array([0.4, 0.0])},
+        ]
+        summary = batch_fair_value_summary(
+            current, batch_estimates, n_samples=10, chunk_size=1, **parameters
+        )
+
+        for i, (company_current, company_estimates) in enumerate(
+            [
+                ({**drivers, "revenue": 100}, estimates),
+                ({**drivers, "revenue": 200}, [{**estimates[0], "probability": 1.0}]),
+            ]
+        ):
+            fair_value = FinancialForecast(
+                current=company_current,
+                estimates=company_estimates,
+                n_samples=10,
+                **parameters,
+            ).get_fair_value_per_share()
+            self.assertAlmostEqual(summary["mean"][i], fair_value.mean())
+            self.assertAlmostEqual(summary["std"][i], fair_value.std())
+            self.assertAlmostEqual(summary["quantiles"][1, i], np.median(fair_value))
+        self.assertEqual(summary["n_nan"].tolist(), [0, 0])
+
+    def test_batch_with_uncertainty(self):
+        current = {
+            "revenue": 2200,
+            "ebit_margin": 0.1,
+            "interest_expense": 100,
+            "deprication_amortization": 200,
+            "net_working_capital": 100,
+        }
+        estimate = {
+            "revenue": 3500,
+            "revenue_uncertainty": 200,
+            "ebit_margin": 0.15,
+            "ebit_margin_uncertainty": 0.02,
+            "interest_expense": 200,
+            "interest_expense_uncertainty": 10,
+            "deprication_amortization": 200,
+            "deprication_amortization_uncertainty": 20,
+            "net_working_capital": 100,
+            "net_working_capital_uncertainty": 0,
+            "probability": 1.0,
+            "shares": 10000,
+        }
+        parameters = dict(n_periods=5, wacc=0.08, perpetual_rate=0.02, tax_rate=0.22)
+        fair_value = FinancialForecast(
+            current=current, estimates=estimate, n_samples=20000, seed=1, **parameters
+        ).get_fair_value_per_share()
+
+        # The second company only has half of the samples, so the rest of its rows are padding.
+        batch_current = {
+            driver: np.array([value] * 2) for driver, value in current.items()
+        }
+        batch_estimate = {**estimate, "probability": np.array([1.0, 0.5])}
+        summary = batch_fair_value_summary(
+            batch_current, batch_estimate, n_samples=20000, seed=2, **parameters
+        )
+        self.assertEqual(summary["n_nan"].tolist(), [0, 0])
+        for i in range(2):
+            self.assertAlmostEqual(
+                summary["mean"][i], fair_value.mean(), delta=0.02 * fair_value.mean()
+            )
+            self.assertAlmostEqual(
+                summary["std"][i], fair_value.std(), delta=0.05 * fair_value.std()
+            )
+
+        # Negative estimates of the deprication give nan samples, like in FinancialForecast.
+        estimate["deprication_amortization_uncertainty"] = 200
+        batch_estimate["deprication_amortization_uncertainty"] = 200
+        fair_value = FinancialForecast(
+            current=current, estimates=estimate, n_samples=20000, seed=1, **parameters
+        ).get_fair_value_per_share()
+        summary = batch_fair_value_summary(
+            batch_current, batch_estimate, n_samples=20000, seed=2, **parameters
+        )
+        self.assertTrue(np.isnan(fair_value.mean()))
+        self.assertTrue(np.isnan(summary["mean"]).all())
+        nan_share = np.isnan(fair_value).mean()
+        self.assertAlmostEqual(summary["n_nan"][0] / 20000, nan_share, delta=0.02)
+        self.assertAlmostEqual(summary["n_nan"][1] / 10000, nan_share, delta=0.02)
+
+    def test_batch_with_dataframes(self):
+        current = pd.DataFrame(
+            data={
+                "revenue": [100.0, 200.0, 300.0],
+                "ebit_margin": 0.1,
+                "interest_expense": 5.0,
+                "deprication_amortization": 10.0,
+                "net_working_capital": 2.0,
+            }
+        )
+        estimate = current * 1.5
+        for driver in current.columns:
+            estimate[driver + "_uncertainty"] = 0.1 * estimate[driver]
+        estimate["probability"] = 1.0
+        estimate["shares"] = [10.0, 20.0, 30.0]
+        parameters = dict(
+            n_periods=5, wacc=0.08, perpetual_rate=0.02, tax_rate=0.22, n_samples=100
+        )
+
+        # A single table is one scenario, like a list with one table or a dictionary of arrays.
+        summary = batch_fair_value_summary(current, estimate, seed=1, **parameters)
+        self.assertEqual(summary["mean"].shape, (3,))
+        for other in [
+            batch_fair_value_summary(current, [estimate], seed=1, **parameters),
+            batch_fair_value_summary(
+                current.to_dict("list"),
+                {column: estimate[column].to_numpy() for column in estimate.columns},
+                seed=1,
+                **parameters,
+            ),
+        ]:
+            np.testing.assert_allclose(other["mean"], summary["mean"])
+            np.testing.assert_allclose(other["quantiles"], summary["quantiles"])
+
+
+class TestAccumulators(unittest.TestCase):
+    def test_online_moments(self):
+        values = np.random.normal(5, 2, 1000)
+        moments = OnlineMoments()
+        for chunk in np.array_split(values, 7):
+            moments.update(chunk)
+        self.assertEqual(moments.count, 1000)
+        self.assertAlmostEqual(moments.mean, values.mean())
+        self.assertAlmostEqual(moments.std, values.std())
+
+    def test_non_finite_values_are_dropped(self):
+        values = np.array([1.0, np.nan, 2.0, -np.inf, 3.0])
+        moments = OnlineMoments()
+        moments.update(values)
+        histogram = StreamingHistogram(n_bins=10)
+        histogram.update(values)
+        self.assertEqual((moments.count, moments.dropped), (3, 2))
+        self.assertEqual((histogram.count, histogram.dropped), (3, 2))
+        self.assertAlmostEqual(moments.mean, 2.0)
+
+        other = OnlineMoments()
+        other.update([np.nan])
+        moments.merge(other)
+        self.assertEqual((moments.count, moments.dropped), (3, 3))
+
+    def test_streaming_histogram(self):
+        values = np.random.normal(0, 1, 100000)
+        histogram = StreamingHistogram(n_bins=1000)
+        for chunk in np.array_split(values, 10):
+            histogram.update(chunk)
+        histogram.update([50.0, -50.0])  # Growing the range to both sides.
+        self.assertEqual(histogram.count, 100002)
+        self.assertLessEqual(histogram.edges[0], -50.0)
+        self.assertGreater(histogram.edges[-1], 50.0)
+        self.assertAlmostEqual(histogram.quantile(0.5), np.median(values), delta=0.2)
+        self.assertAlmostEqual(
+            np.sum(histogram.density() * histogram.width), 1.0, places=6
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
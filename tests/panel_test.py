@@ -0,0 +1,113 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.utils.panel import PeerPanel
+
+
+class TestPeerPanel(unittest.TestCase):
+    def setUp(self):
+        self.data = pd.DataFrame(
+            data={
+                "metric": pd.Categorical(
+                    ["quarterlyPeRatio"] * 3 + ["quarterlyPsRatio"] * 2
+                ),
+                "date": pd.to_datetime(
+                    [
+                        "2023-03-31",
+                        "2023-06-30",
+                        "2023-03-31",
+                        "2023-03-31",
+                        "2022-12-31",
+                    ]
+                ),
+                "value": [25.1, 24.3, 18.0, 7.0, 3.0],
+                "ticker": pd.Categorical(
+                    ["AAPL", "AAPL", "MSFT", "AAPL", "MSFT"],
+                    categories=["AAPL", "MSFT", "GOOG"],
+                ),
+            }
+        )
+        self.panel = PeerPanel(self.data)
+
+    def test_shape(self):
+        self.assertEqual(self.panel.values.shape, (3, 2, 3))
+        self.assertEqual(self.panel.tickers.tolist(), ["AAPL", "MSFT", "GOOG"])
+
+    def test_get_value(self):
+        self.assertEqual(
+            self.panel.get_value("AAPL", "quarterlyPeRatio", "2023-06-30"), 24.3
+        )
+        self.assertTrue(
+            np.isnan(self.panel.get_value("MSFT", "quarterlyPeRatio", "2023-06-30"))
+        )
+        self.assertTrue(
+            np.isnan(self.panel.get_value("MSFT", "quarterlyPeRatio", "2020-01-01"))
+        )
+
+    def test_get_latest(self):
+        date, value = self.panel.get_latest("MSFT", "quarterlyPsRatio")
+        self.assertEqual(date, pd.Timestamp("2022-12-31"))
+        self.assertEqual(value, 3.0)
+        date, value = self.panel.get_latest("GOOG", "quarterlyPsRatio")
+        self.assertTrue(pd.isna(date) and np.isnan(value))
+
+    def test_get_as_of(self):
+        date, value = self.panel.get_as_of("AAPL", "quarterlyPeRatio", "2023-05-15")
+        self.assertEqual((date, value), (pd.Timestamp("2023-03-31"), 25.1))
+        date, value = self.panel.get_as_of("MSFT", "quarterlyPsRatio", "2024-01-01")
+        self.assertEqual((date, value), (pd.Timestamp("2022-12-31"), 3.0))
+        date, value = self.panel.get_as_of("AAPL", "quarterlyPsRatio", "2023-01-01")
+        self.assertTrue(pd.isna(date) and np.isnan(value))
+        # Tickers and metrics that aren't in the panel don't have values.
+        date, value = self.panel.get_as_of("AAPL", "quarterlyPbRatio")
+        self.assertTrue(pd.isna(date) and np.isnan(value))
+        self.assertTrue(
+            np.isnan(self.panel.get_value("TSLA", "quarterlyPeRatio", "2023-03-31"))
+        )
+
+    def test_get_snapshot(self):
+        snapshot = self.panel.get_snapshot("quarterlyPsRatio", "2023-06-30")
+        self.assertEqual(snapshot["ticker"].tolist(), ["AAPL", "MSFT", "GOOG"])
+        self.assertEqual(snapshot["value"].tolist()[:2], [7.0, 3.0])
+        self.assertEqual(snapshot["date"][1], pd.Timestamp("2022-12-31"))
+        self.assertTrue(pd.isna(snapshot["date"][2]))
+        # Before the first date there aren't any values.
+        snapshot = self.panel.get_snapshot("quarterlyPsRatio", "2020-01-01")
+        self.assertTrue(snapshot["value"].isna().all())
+
+    def test_get_history(self):
+        history = self.panel.get_history("quarterlyPeRatio")
+        self.assertEqual(history["ticker"].tolist(), ["AAPL", "AAPL", "MSFT"])
+        self.assertEqual(history["value"].tolist(), [25.1, 24.3, 18.0])
+        self.assertEqual(len(self.panel.get_history("quarterlyPbRatio")), 0)
+
+    def test_get_latest_values(self):
+        values = self.panel.get_latest_values("quarterlyPeRatio")
+        self.assertEqual(values[["AAPL", "MSFT"]].tolist(), [24.3, 18.0])
+        self.assertTrue(np.isnan(values["GOOG"]))
+
+    def test_coverage(self):
+        self.assertEqual(self.panel.coverage["quarterlyPeRatio"], 2)
+        self.assertEqual(
+            self.panel.get_metrics_with_coverage(2),
+            ["quarterlyPeRatio", "quarterlyPsRatio"],
+        )
+        self.assertEqual(self.panel.get_metrics_with_coverage(3), [])
+
+    def test_empty_panel(self):
+        # Yahoo didn't return any stats for the tickers, so there aren't any metrics or dates.
+        panel = PeerPanel(self.data.iloc[:0].assign(metric=pd.Categorical([])))
+        self.assertEqual(panel.values.shape, (3, 0, 0))
+        snapshot = panel.get_snapshot("quarterlyPeRatio")
+        self.assertEqual(snapshot["ticker"].tolist(), ["AAPL", "MSFT", "GOOG"])
+        self.assertTrue(
+            snapshot["value"].isna().all() and snapshot["date"].isna().all()
+        )
+        self.assertEqual(len(panel.get_history("quarterlyPeRatio")), 0)
+        self.assertTrue(panel.get_latest_values("quarterlyPeRatio").isna().all())
+        self.assertTrue(np.isnan(panel.get_as_of("AAPL", "quarterlyPeRatio")[1]))
+        self.assertEqual(panel.get_metrics_with_coverage(1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
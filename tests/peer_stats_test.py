@@ -0,0 +1,162 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.utils.panel import PeerPanel
+from src.utils.peer_stats import (
+    compute_peer_stats,
+    compute_valuation_priors,
+    get_latest_peer_stats,
+)
+
+
+class TestPeerStats(unittest.TestCase):
+    def setUp(self):
+        tickers = ["AAPL", "MSFT", "GOOG", "AMZN"]
+        self.data = pd.DataFrame(
+            data={
+                "metric": ["quarterlyPeRatio"] * 8 + ["quarterlyPsRatio"] * 2,
+                "date": pd.to_datetime(
+                    ["2023-03-31"] * 4 + ["2023-06-30"] * 4 + ["2023-03-31"] * 2
+                ),
+                "value": [20.0, 10.0, 30.0, 40.0, 25.0, 15.0, 35.0, np.nan, 5.0, 7.0],
+                "ticker": tickers * 2 + ["MSFT", "GOOG"],
+            }
+        )
+        self.stats = compute_peer_stats(PeerPanel(self.data), "AAPL")
+
+    def test_stats(self):
+        row = self.stats.iloc[0]
+        self.assertEqual(
+            (row["metric"], row["date"]),
+            ("quarterlyPeRatio", pd.Timestamp("2023-03-31")),
+        )
+        self.assertEqual(row["n_peers"], 3)
+        self.assertEqual((row["median"], row["p25"], row["p75"]), (30.0, 20.0, 35.0))
+        self.assertAlmostEqual(
+            row["z_score"], (20.0 - 80.0 / 3) / np.std([10.0, 30.0, 40.0], ddof=1)
+        )
+        self.assertEqual(row["rank"], 3)
+        self.assertAlmostEqual(row["lower_share"], 1 / 3)
+
+    def test_missing_primary(self):
+        # The primary ticker doesn't have the metric, so it doesn't have a rank or z-score.
+        row = self.stats[self.stats["metric"] == "quarterlyPsRatio"].iloc[0]
+        self.assertEqual(row["n_peers"], 2)
+        self.assertTrue(np.isnan(row["value"]) and np.isnan(row["z_score"]))
+        self.assertTrue(pd.isna(row["rank"]))
+
+    def test_latest(self):
+        latest = get_latest_peer_stats(self.stats)
+        self.assertEqual(latest["metric"].tolist(), ["quarterlyPeRatio"])
+        self.assertEqual(latest["date"][0], pd.Timestamp("2023-06-30"))
+        # AMZN doesn't have a value at the latest date, so its previous value is used.
+        self.assertEqual((latest["n_peers"][0], latest["rank"][0]), (3, 3))
+
+    def test_peers_as_of_date(self):
+        # The primary ticker reports a day after its peers, which are compared by their last values.
+        data = pd.DataFrame(
+            data={
+                "metric": ["quarterlyPeRatio"] * 3 + ["quarterlyPsRatio"],
+                "date": pd.to_datetime(
+                    ["2023-03-30", "2023-03-30", "2023-03-31", "2023-03-31"]
+                ),
+                "value": [20.0, 30.0, 5.0, 2.0],
+                "ticker": ["MSFT", "GOOG", "AAPL", "AAPL"],
+            }
+        )
+        latest = get_latest_peer_stats(compute_peer_stats(PeerPanel(data), "AAPL"))
+        pe = latest[latest["metric"] == "quarterlyPeRatio"].iloc[0]
+        self.assertEqual((pe["n_peers"], pe["median"], pe["rank"]), (2, 25.0, 3))
+        # Without any peers there isn't a rank.
+        ps = latest[latest["metric"] == "quarterlyPsRatio"].iloc[0]
+        self.assertEqual(ps["n_peers"], 0)
+        self.assertTrue(pd.isna(ps["rank"]) and np.isnan(ps["lower_share"]))
+
+    def test_empty_panel(self):
+        # Yahoo didn't return any stats for the tickers.
+        panel = PeerPanel(self.data.iloc[:0].assign(metric=pd.Categorical([])))
+        stats = compute_peer_stats(panel, "AAPL")
+        self.assertEqual(len(stats), 0)
+        self.assertEqual(stats.columns.tolist(), self.stats.columns.tolist())
+        self.assertEqual(len(get_latest_peer_stats(stats)), 0)
+        # Without any peers there aren't any peer statistics.
+        stats = compute_peer_stats(
+            PeerPanel(self.data[self.data["ticker"] == "AAPL"]), "AAPL"
+        )
+        self.assertEqual(stats["n_peers"].tolist(), [0, 0])
+        self.assertTrue(stats["median"].isna().all() and stats["rank"].isna().all())
+
+
+class TestValuationPriors(unittest.TestCase):
+    def test_priors(self):
+        dates = pd.to_datetime(["2022-12-31", "2023-03-31", "2023-06-30"])
+        data = pd.DataFrame(
+            data={
+                "metric": ["quarterlyMarketCap"] * 6 + ["quarterlyPsRatio"] * 6,
+                "date": np.tile(dates, 4),
+                # The sales of AAPL grow 10 % per quarter and the sales of MSFT are constant.
+                "value": [100.0, 121.0, 146.41, 50.0, 50.0, 50.0]
+                + [10.0, 11.0, 12.1, 5.0, 5.0, -1.0],
+                "ticker": np.tile(np.repeat(["AAPL", "MSFT"], 3), 2),
+            }
+        )
+        priors = compute_valuation_priors(PeerPanel(data))
+
+        ps = priors["quarterlyPsRatio"]
+        # The negative ratio isn't used.
+        self.assertEqual(ps["n"], 5)
+        self.assertAlmostEqual(ps["mean"], np.mean([10.0, 11.0, 12.1, 5.0, 5.0]))
+        self.assertAlmostEqual(ps["std"], np.std([10.0, 11.0, 12.1, 5.0, 5.0], ddof=1))
+        self.assertAlmostEqual(ps["quantiles"][0.5], 10.0)
+        # The growth is scaled by the years between the quarters (90 and 91 days).
+        years = np.array([90, 91, 90]) / 365.25
+        growth = np.array([np.log(1.1), np.log(1.1), 0.0]) / np.sqrt(years)
+        self.assertAlmostEqual(ps["financial_growth_std"], np.std(growth, ddof=1))
+        # KPIs that aren't in the panel don't have priors.
+        self.assertEqual(priors["quarterlyForwardPeRatio"]["n"], 0)
+        self.assertTrue(np.isnan(priors["quarterlyForwardPeRatio"]["std"]))
+
+    def test_empty_panel(self):
+        # Yahoo didn't return any stats for the tickers.
+        data = pd.DataFrame(
+            data={
+                "metric": pd.Categorical([]),
+                "date": pd.to_datetime([]),
+                "value": np.array([], dtype=np.float64),
+                "ticker": pd.Categorical([], categories=["AAPL", "MSFT"]),
+            }
+        )
+        for prior in compute_valuation_priors(PeerPanel(data)).values():
+            self.assertEqual(prior["n"], 0)
+            self.assertTrue(np.isnan(prior["mean"]) and np.isnan(prior["std"]))
+            self.assertTrue(np.isnan(prior["quantiles"][0.5]))
+            self.assertTrue(np.isnan(prior["financial_growth_std"]))
+
+    def test_growth_off_calendar(self):
+        # GOOG reports between the quarters of AAPL, which doesn't remove the growth of AAPL.
+        data = pd.DataFrame(
+            data={
+                "metric": ["quarterlyMarketCap"] * 5 + ["quarterlyPsRatio"] * 5,
+                "date": pd.to_datetime(
+                    [
+                        "2022-12-31",
+                        "2023-03-31",
+                        "2023-06-30",
+                        "2023-02-15",
+                        "2023-08-15",
+                    ]
+                    * 2
+                ),
+                "value": [100.0, 121.0, 146.41, 50.0, 60.0]
+                + [10.0, 11.0, 12.1, 5.0, 6.0],
+                "ticker": ["AAPL"] * 3 + ["GOOG"] * 2 + ["AAPL"] * 3 + ["GOOG"] * 2,
+            }
+        )
+        ps = compute_valuation_priors(PeerPanel(data))["quarterlyPsRatio"]
+        years = np.array([90, 91, 181]) / 365.25
+        growth = np.array([np.log(1.1), np.log(1.1), 0.0]) / np.sqrt(years)
+        self.assertAlmostEqual(ps["financial_growth_std"], np.std(growth, ddof=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.utils.plotter import Plotter, lttb
+
+
+class TestPlotter(unittest.TestCase):
+    def setUp(self):
+        self.data = pd.DataFrame(
+            data={
+                "date": [1, 2, 1, 2],
+                "value": [2.5e9, 3e9, 4e8, 5e8],
+                "ticker": ["ORSTED.CO", "ORSTED.CO", "VWS.CO", "VWS.CO"],
+            }
+        )
+        self.plotter = Plotter(self.data, primary_ticker="ORSTED.CO", peers=["VWS.CO"])
+
+    def test_convert_numbers(self):
+        self.assertEqual(
+            self.plotter._convert_numbers([2.5e12, 3.04e9]), ["2.5T", "0.0T"]
+        )
+        self.assertEqual(self.plotter._convert_numbers([1500, 25.14]), ["1.5K", "0.0K"])
+        self.assertEqual(
+            self.plotter._convert_numbers([25.14, 3, -4.26]), ["25.1", "3.0", "-4.3"]
+        )
+        self.assertEqual(self.plotter._convert_numbers([]), [])
+
+    def test_bar(self):
+        fig = self.plotter.bar(y_col="value", mask=self.data["date"] == 2)
+        self.assertEqual(list(fig.data[0].x), ["ORSTED.CO", "VWS.CO"])
+        self.assertEqual(list(fig.data[0].text), ["3.0B", "0.5B"])
+        # The data of the plotter isn't changed by the mask.
+        self.assertEqual(len(self.plotter.data), 4)
+
+    def test_line_downsampling(self):
+        fig = self.plotter.line(y_col="value")
+        self.assertEqual([type(trace).__name__ for trace in fig.data], ["Scatter"] * 2)
+
+        dates = pd.date_range("2000-01-01", periods=1000)
+        data = pd.DataFrame(
+            data={
+                "date": np.tile(dates, 2),
+                "value": np.arange(2000.0),
+                "ticker": np.repeat(["ORSTED.CO", "VWS.CO"], 1000),
+            }
+        )
+        fig = Plotter(data, primary_ticker="ORSTED.CO", peers=["VWS.CO"]).line(
+            y_col="value", max_points=100
+        )
+        self.assertEqual(
+            [type(trace).__name__ for trace in fig.data], ["Scattergl"] * 2
+        )
+        self.assertEqual([len(trace.x) for trace in fig.data], [50, 50])
+
+
+class TestLTTB(unittest.TestCase):
+    def test_lttb(self):
+        x = np.arange(1000.0)
+        y = np.zeros(1000)
+        y[500] = 10.0
+        keep = lttb(x, y, 20)
+        self.assertEqual(len(keep), 20)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        # The peak is kept.
+        self.assertIn(500, keep)
+        # Nothing is removed when there are few points.
+        self.assertEqual(lttb(x[:10], y[:10], 20).tolist(), list(range(10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+from src.utils.simulation import MonteCarloSimulation
+
+
+def create_simulation(**kwargs):
+    return MonteCarloSimulation(
+        kpi_current=15,
+        kpi_estimated=20,
+        kpi_std=1,
+        financial_current=200,
+        financial_estimated=280,
+        financial_std=30,
+        **kwargs
+    )
+
+
+class TestMonteCarloSimulation(unittest.TestCase):
+    def test_seed_is_reproducible(self):
+        first = create_simulation(seed=1).get_valuation_distribution()
+        second = create_simulation(seed=1).get_valuation_distribution()
+        self.assertTrue(np.array_equal(first, second))
+
+    def test_float32(self):
+        sim = create_simulation(seed=1, dtype=np.float32)
+        self.assertEqual(sim.get_valuation_distribution().dtype, np.float32)
+
+    def test_distributions_are_sampled_once(self):
+        sim = create_simulation(n_simulations=1000)
+        valuation = sim.get_valuation_distribution()
+        self.assertEqual(valuation.shape, (1000,))
+        self.assertIs(sim.get_kpi_distribution(), sim.get_kpi_distribution())
+        self.assertTrue(
+            np.array_equal(
+                valuation,
+                sim.get_kpi_distribution() * sim.get_financial_distribution(),
+            )
+        )
+        cagr = sim.get_valuation_cagr_distribution(periods=5)
+        self.assertTrue(np.allclose((1 + cagr) ** 5 * 15 * 200, valuation))
+
+    def test_analytical_statistics(self):
+        sim = create_simulation(n_simulations=1000000, seed=1)
+        valuation = sim.get_valuation_distribution()
+        self.assertAlmostEqual(
+            sim.get_valuation_mean() / valuation.mean(), 1.0, places=2
+        )
+        self.assertAlmostEqual(sim.get_valuation_std() / valuation.std(), 1.0, places=2)
+        threshold = 15 * 200 * 1.1**5
+        self.assertAlmostEqual(
+            sim.get_cagr_probability(periods=5, wanted_cagr=0.1),
+            np.mean(valuation > threshold),
+            places=2,
+        )
+
+    def test_cagr_probability_without_uncertainty(self):
+        sim = create_simulation()
+        sim.kpi_std, sim.financial_std = 0, 0
+        self.assertEqual(sim.get_cagr_probability(periods=1, wanted_cagr=0.5), 1.0)
+        self.assertEqual(sim.get_cagr_probability(periods=1, wanted_cagr=1.0), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
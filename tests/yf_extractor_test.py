@@ -0,0 +1,230 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+from src.utils.cache import FundamentalsCache
+from src.utils.session import TokenBucket, YahooSession
+from src.utils.yf_extractor import PERIOD1, YahooExtractor
+
+STATS = {
+    "timeseries": {
+        "result": [
+            {
+                "meta": {"type": ["quarterlyPeRatio"]},
+                "quarterlyPeRatio": [
+                    {"asOfDate": "2023-03-31", "reportedValue": {"raw": 25.1}},
+                    {"asOfDate": "2023-06-30", "reportedValue": {"raw": 24.3}},
+                ],
+            },
+            # Metrics without data are skipped.
+            {"meta": {"type": ["quarterlyPegRatio"]}},
+            {
+                "meta": {"type": ["trailingPsRatio"], "note": "<p>not html</p>"},
+                "trailingPsRatio": [
+                    {"asOfDate": "2023-06-30", "reportedValue": {"raw": 7.0}}
+                ],
+            },
+        ]
+    }
+}
+RECOMMENDATIONS = {
+    "finance": {"result": [{"recommendedSymbols": [{"symbol": "MSFT"}]}]}
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # The status codes to respond with before responding with the payload.
+    failures = []
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.failures:
+            self.send_response(self.failures.pop(0))
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        if self.path.startswith("/timeseries/"):
+            # Only responding with the requested metrics.
+            types = parse_qs(urlparse(self.path).query)["type"][0].split(",")
+            payload = {
+                "timeseries": {
+                    "result": [
+                        stats
+                        for stats in STATS["timeseries"]["result"]
+                        if stats["meta"]["type"][0] in types
+                    ]
+                }
+            }
+        else:
+            payload = RECOMMENDATIONS
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestYahooExtractor(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.requests = []
+        StubHandler.failures = []
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        ).start()
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        self.patches = [
+            mock.patch("src.utils.yf_extractor.TIMESERIES_URL", url + "/timeseries/"),
+            mock.patch(
+                "src.utils.yf_extractor.RECOMMENDATIONS_URL", url + "/recommendations/"
+            ),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.session = YahooSession(backoff_factor=0, rate=1000, burst=10)
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_stats(self):
+        df = YahooExtractor("AAPL", session=self.session).get_stats()
+        self.assertEqual(
+            df["metric"].tolist(),
+            ["quarterlyPeRatio", "quarterlyPeRatio", "trailingPsRatio"],
+        )
+        self.assertEqual(df["value"].tolist(), [25.1, 24.3, 7.0])
+        self.assertEqual(df["ticker"].tolist(), ["AAPL"] * 3)
+        self.assertEqual(str(df["metric"].dtype), "category")
+        self.assertTrue(str(df["date"].dtype).startswith("datetime64"))
+
+    def test_get_stats_many(self):
+        finished = []
+        df = YahooExtractor.get_stats_many(
+            ["AAPL", "MSFT", "AAPL"],
+            callback=lambda i, total, ticker: finished.append((i, total)),
+            session=self.session,
+        )
+        self.assertEqual(df["ticker"].tolist(), ["AAPL"] * 3 + ["MSFT"] * 3)
+        self.assertEqual(finished, [(1, 2), (2, 2)])
+
+    def test_get_stats_many_order(self):
+        def get_stat_columns(extractor, metrics):
+            # The first ticker finishes last.
+            time.sleep(0.05 if extractor.ticker == "AAPL" else 0)
+            return {
+                "metric": ["quarterlyPeRatio"],
+                "date": ["2023-06-30"],
+                "value": [float(len(extractor.ticker))],
+            }
+
+        finished = []
+        with mock.patch.object(
+            YahooExtractor,
+            "_get_stat_columns",
+            autospec=True,
+            side_effect=get_stat_columns,
+        ) as patched:
+            df = YahooExtractor.get_stats_many(
+                ["AAPL", "MSFT", "AAPL", "GOOGL"],
+                callback=lambda *args: finished.append(args),
+                session=self.session,
+            )
+
+        # Each ticker is only extracted once and the stats are in the order of the tickers.
+        self.assertEqual(patched.call_count, 3)
+        self.assertEqual(df["ticker"].tolist(), ["AAPL", "MSFT", "GOOGL"])
+        self.assertEqual(df["value"].tolist(), [4.0, 4.0, 5.0])
+        self.assertEqual(
+            [(i, total) for i, total, _ in finished], [(1, 3), (2, 3), (3, 3)]
+        )
+        self.assertEqual(finished[-1][2], "AAPL")
+
+    def test_incremental_refresh(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FundamentalsCache(os.path.join(directory, "cache.sqlite"), ttl=-1)
+            extractor = YahooExtractor("AAPL", cache=cache, session=self.session)
+            first = extractor.get_stats()
+            # Refreshing a day later, when the cache isn't up to date anymore.
+            with mock.patch("time.time", return_value=time.time() + 86400):
+                second = extractor.get_stats()
+
+        period1 = [
+            int(parse_qs(urlparse(path).query)["period1"][0])
+            for path in self.server.requests
+        ]
+        # The second request starts from the last cached quarter (2023-06-30).
+        self.assertEqual(period1, [PERIOD1, 1688083200])
+        self.assertTrue(first.equals(second))
+
+    def test_fresh_cache_is_looked_up_once(self):
+        cache = FundamentalsCache(":memory:")
+        extractor = YahooExtractor("AAPL", cache=cache, session=self.session)
+        first = extractor.get_stats()
+        second = extractor.get_stats()
+        self.assertTrue(first.equals(second))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_offline_uses_stale_cache(self):
+        cache = FundamentalsCache(":memory:", ttl=-1)
+        extractor = YahooExtractor("AAPL", cache=cache, session=self.session)
+        first = extractor.get_stats()
+        # The cached stats have expired, and the refresh fails.
+        with mock.patch.object(
+            self.session, "get_json", side_effect=ConnectionError("offline")
+        ):
+            second = extractor.get_stats()
+            self.assertTrue(first.equals(second))
+            # Stats that have never been fetched can't be used.
+            with self.assertRaises(ConnectionError):
+                YahooExtractor("MSFT", cache=cache, session=self.session).get_stats()
+
+    def test_get_stats_metrics(self):
+        cache = FundamentalsCache(":memory:")
+        extractor = YahooExtractor("AAPL", cache=cache, session=self.session)
+        first = extractor.get_stats(metrics=["quarterlyPeRatio"])
+        second = extractor.get_stats(metrics=["trailingPsRatio", "quarterlyPeRatio"])
+
+        types = [
+            parse_qs(urlparse(path).query)["type"][0] for path in self.server.requests
+        ]
+        # Only the metric that isn't cached is fetched the second time.
+        self.assertEqual(types, ["quarterlyPeRatio", "trailingPsRatio"])
+        self.assertEqual(first["value"].tolist(), [25.1, 24.3])
+        self.assertEqual(
+            second["metric"].tolist(),
+            ["trailingPsRatio", "quarterlyPeRatio", "quarterlyPeRatio"],
+        )
+        with self.assertRaises(ValueError):
+            extractor.get_stats(metrics=["quarterlyPeRatios"])
+
+    def test_retries_too_many_requests(self):
+        StubHandler.failures = [429, 503]
+        symbols = YahooExtractor("AAPL", session=self.session).get_recommended_symbols()
+        self.assertEqual(symbols, ["MSFT"])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        # The first two tokens are available at once, the next two take 1/20 second each.
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+if __name__ == "__main__":
+    unittest.main()